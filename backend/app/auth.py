@@ -1,15 +1,26 @@
 """
 Authentication utilities
+
+Access tokens are short-lived and carry the claims voice endpoints need
+(`sub`, `uid`, `active`), so they are authorized without a DB lookup.
+Refresh tokens renew them (and re-check the user in the DB). Tokens are
+signed with the key named by their `kid` header, so keys can be rotated by
+adding a new key, making it active and removing the old one once the
+tokens it signed have expired.
 """
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database import get_db, User
 from app.config import settings
+import json
+import time
+import uuid
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -18,11 +29,113 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+REFRESH_TOKEN_EXPIRE_DAYS = settings.refresh_token_expire_days
+
+TOKEN_TYPE_ACCESS = "access"
+TOKEN_TYPE_REFRESH = "refresh"
+
+# Claves de firma por kid; sin JWT_KEYS se usa SECRET_KEY con kid "default"
+SIGNING_KEYS: Dict[str, str] = json.loads(settings.jwt_keys) if settings.jwt_keys else {"default": SECRET_KEY}
+ACTIVE_KID = settings.jwt_active_kid or next(iter(SIGNING_KEYS))
 
 # Bearer token
 security = HTTPBearer()
 
 
+class TokenUser:
+    """Usuario autenticado a partir de los claims del access token (sin BD)"""
+
+    def __init__(self, user_id: int, username: str, is_active: bool):
+        self.user_id = user_id
+        self.username = username
+        self.is_active = is_active
+
+
+class TokenRevocationList:
+    """
+    Revocaciones en memoria hasta que el token habría expirado
+
+    La lista es por proceso: con varios workers una revocación solo se aplica
+    en el que la recibió, así que un logout o la rotación de refresh tokens no
+    impide usar el token anterior en otro worker hasta que expire.
+    """
+
+    def __init__(self):
+        """Initialize list"""
+        self._tokens: Dict[str, float] = {}
+        self._users: Dict[str, float] = {}
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """Revocar un token por su jti"""
+        self._tokens[jti] = expires_at
+        self._prune()
+
+    def revoke_user(self, username: str) -> None:
+        """Revocar todos los tokens emitidos hasta ahora para un usuario"""
+        # Con precisión de subsegundo, como el iat de los tokens: un login
+        # justo después no queda revocado
+        self._users[username] = time.time()
+
+    def is_revoked(self, payload: dict) -> bool:
+        """Comprobar si un token decodificado está revocado"""
+        if payload.get("jti") in self._tokens:
+            return True
+        revoked_before = self._users.get(payload.get("sub"))
+        return revoked_before is not None and payload.get("iat", 0) <= revoked_before
+
+    def _prune(self) -> None:
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._tokens.items() if expires_at < now]:
+            del self._tokens[jti]
+        horizon = now - REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        for username in [u for u, revoked_at in self._users.items() if revoked_at < horizon]:
+            del self._users[username]
+
+
+class TokenVerificationCache:
+    """LRU de tokens ya verificados: evita repetir la verificación de firma"""
+
+    def __init__(self, max_entries: int):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: Tokens kept (LRU)
+        """
+        self.max_entries = max_entries
+        self._payloads: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        """Payload de un token verificado y no expirado, o None"""
+        payload = self._payloads.get(token)
+        if payload is None:
+            self.misses += 1
+            return None
+        if payload["exp"] < time.time():
+            del self._payloads[token]
+            self.misses += 1
+            return None
+        self._payloads.move_to_end(token)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        """Guardar un token verificado"""
+        self._payloads[token] = payload
+        while len(self._payloads) > self.max_entries:
+            self._payloads.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get counters"""
+        return {"entries": len(self._payloads), "hits": self.hits, "misses": self.misses}
+
+
+revocation_list = TokenRevocationList()
+verification_cache = TokenVerificationCache(settings.token_cache_size)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar contraseña"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -33,51 +146,118 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def _encode_token(claims: dict, token_type: str, expires_delta: timedelta) -> str:
+    now = datetime.utcnow()
+    to_encode = claims.copy()
+    to_encode.update({
+        "typ": token_type,
+        "jti": uuid.uuid4().hex,
+        # iat con fracción de segundo (NumericDate admite no enteros) para
+        # distinguir tokens emitidos en el mismo segundo que un logout-all
+        "iat": time.time(),
+        "exp": now + expires_delta,
+    })
+    return jwt.encode(to_encode, SIGNING_KEYS[ACTIVE_KID], algorithm=ALGORITHM, headers={"kid": ACTIVE_KID})
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Crear JWT token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    """Crear JWT access token (data debe incluir sub, uid y active)"""
+    return _encode_token(data, TOKEN_TYPE_ACCESS, expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Obtener usuario actual desde token JWT"""
-    credentials_exception = HTTPException(
+def create_refresh_token(username: str) -> str:
+    """Crear JWT refresh token"""
+    return _encode_token({"sub": username}, TOKEN_TYPE_REFRESH, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
+
+def create_token_pair(user: User) -> Dict[str, str]:
+    """Access token con los claims del usuario y refresh token"""
+    return {
+        "access_token": create_access_token(
+            {"sub": user.username, "uid": user.user_id, "active": user.is_active}
+        ),
+        "refresh_token": create_refresh_token(user.username),
+    }
+
+
+def decode_token(token: str, token_type: str = TOKEN_TYPE_ACCESS) -> dict:
+    """
+    Verificar y decodificar un JWT (lanza JWTError si no es válido)
+
+    Los tokens ya verificados se sirven desde la caché; la revocación se
+    comprueba siempre.
+    """
+    payload = verification_cache.get(token)
+    if payload is None:
+        kid = jwt.get_unverified_header(token).get("kid", "default")
+        key = SIGNING_KEYS.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown key id: {kid}")
+        payload = jwt.decode(token, key, algorithms=[ALGORITHM])
+        verification_cache.put(token, payload)
+    if payload.get("typ") != token_type:
+        raise JWTError("Wrong token type")
+    if revocation_list.is_revoked(payload):
+        raise JWTError("Token revoked")
+    return payload
+
+
+def decode_access_token(token: str) -> dict:
+    """Verificar y decodificar un access token (lanza JWTError si no es válido)"""
+    return decode_token(token, TOKEN_TYPE_ACCESS)
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == username).first()
+
+
+def get_token_payload(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """Claims del access token actual"""
+    # El middleware de rate limiting ya verificó este mismo token
+    payload = getattr(request.state, "token_payload", None)
+    if payload is None:
+        try:
+            payload = decode_access_token(credentials.credentials)
+        except JWTError:
+            raise _credentials_exception()
+    if payload.get("sub") is None or payload.get("uid") is None:
+        raise _credentials_exception()
+    return payload
+
+
+def get_token_user(payload: dict = Depends(get_token_payload)) -> TokenUser:
+    """Obtener usuario actual desde los claims del token (sin consulta a BD)"""
+    return TokenUser(
+        user_id=payload["uid"],
+        username=payload["sub"],
+        is_active=payload.get("active", True)
+    )
+
+
+def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_db)
+) -> User:
+    """Obtener usuario actual desde BD (perfil completo)"""
+    user = db.query(User).filter(User.username == payload["sub"]).first()
     if user is None:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Usuario inactivo")
-    
+
     return user
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_active_user(current_user: TokenUser = Depends(get_token_user)) -> TokenUser:
     """Verificar que el usuario esté activo"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Usuario inactivo")
-    return current_user
\ No newline at end of file
+    return current_user
@@ -0,0 +1,156 @@
+"""
+Response compression middleware
+gzip, or brotli when the optional `brotli` package is installed and the
+client accepts it, for JSON/text bodies above a size threshold
+
+Only complete bodies sent in a single message are compressed: streamed
+responses (audio, voice frames) pass through untouched so nothing is
+buffered on the latency-sensitive paths.
+"""
+from typing import Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+import gzip
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _parse_accept_encoding(accept_encoding: str) -> Dict[str, float]:
+    """Map each coding in Accept-Encoding to its q-value (RFC 9110 §12.5.3)"""
+    qvalues: Dict[str, float] = {}
+    for entry in accept_encoding.split(","):
+        params = [param.strip() for param in entry.split(";")]
+        coding = params[0].lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    # Un q mal formado no cuenta como aceptación
+                    q = 0.0
+        qvalues[coding] = q
+    return qvalues
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    qvalues = _parse_accept_encoding(accept_encoding)
+    wildcard = qvalues.get("*", 0.0)
+
+    def acceptable(coding: str) -> bool:
+        # q=0 (en cualquier forma: 0, 0.0, 0.000) rechaza la codificación;
+        # "*" cubre las que no aparecen explícitamente
+        return qvalues.get(coding, wildcard) > 0
+
+    if brotli is not None and acceptable("br"):
+        return "br"
+    if acceptable("gzip"):
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.compression_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level)
+
+
+class CompressionStats:
+    """Bytes before and after compression per encoding"""
+
+    def __init__(self):
+        """Initialize counters"""
+        self.responses: Dict[str, int] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, encoding: str, size_in: int, size_out: int) -> None:
+        """Record a compressed response"""
+        self.responses[encoding] = self.responses.get(encoding, 0) + 1
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+
+    def snapshot(self) -> Dict[str, object]:
+        """Get counters"""
+        return {
+            "brotli_available": brotli is not None,
+            "responses": dict(self.responses),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+        }
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing single-message JSON/text responses"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int):
+        """
+        Initialize middleware
+
+        Args:
+            app: Wrapped ASGI app
+            minimum_size: Smallest body (bytes) worth compressing
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                if (
+                    "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                ):
+                    await send(message)
+                else:
+                    # Esperar al cuerpo para saber si es completo y suficientemente grande
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start.setdefault("headers", []))
+            headers.add_vary_header("Accept-Encoding")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+
+            compressed = _compress(body, encoding)
+            compression_stats.record(encoding, len(body), len(compressed))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# Global stats instance
+compression_stats = CompressionStats()
@@ -0,0 +1,155 @@
+"""
+Graceful draining
+Tracks in-flight voice turns (including streamed bodies) so a shutdown can
+stop taking new turns and let the running ones finish before the OpenAI
+client and the DB pool are closed
+
+Draining starts on SIGTERM/SIGINT (chained before the server's own
+handler) or at the latest in the lifespan shutdown: readiness turns 503
+and new turns get 503 + Retry-After while the in-flight ones complete.
+"""
+from typing import Any, Callable, Dict, List, Optional
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.config import settings
+import asyncio
+import logging
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DrainCoordinator:
+    """In-flight turn counter and draining state"""
+
+    def __init__(self, paths: List[str]):
+        """
+        Initialize coordinator
+
+        Args:
+            paths: Path prefixes of the requests that are voice turns
+        """
+        self.paths = paths
+        self.draining = False
+        self.inflight = 0
+        self.rejected = 0
+        self.drain_started_at: Optional[float] = None
+        self.last_drain: Optional[Dict[str, Any]] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    def applies(self, path: str) -> bool:
+        """Whether a request path is a voice turn"""
+        return any(path.startswith(prefix) for prefix in self.paths)
+
+    def begin_drain(self) -> None:
+        """Stop accepting new turns (idempotent, safe from a signal handler)"""
+        if not self.draining:
+            self.draining = True
+            self.drain_started_at = time.perf_counter()
+            logger.info("Draining: no new voice turns accepted (%s in flight)", self.inflight)
+
+    def _idle_event(self) -> asyncio.Event:
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            if self.inflight == 0:
+                self._idle.set()
+        return self._idle
+
+    def enter(self) -> None:
+        """Register a turn that started"""
+        self.inflight += 1
+        self._idle_event().clear()
+
+    def exit(self) -> None:
+        """Register a turn that finished"""
+        self.inflight -= 1
+        if self.inflight == 0:
+            self._idle_event().set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """
+        Wait for in-flight turns
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if every turn finished in time
+        """
+        try:
+            await asyncio.wait_for(self._idle_event().wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def install_signal_hooks(self) -> None:
+        """
+        Start draining as soon as SIGTERM/SIGINT arrives, then run the
+        previously installed handler (the server's own shutdown)
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous: Callable = previous) -> None:
+                self.begin_drain()
+                previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get draining state and last drain report"""
+        return {
+            "draining": self.draining,
+            "inflight": self.inflight,
+            "rejected": self.rejected,
+            "last_drain": self.last_drain,
+        }
+
+
+class DrainMiddleware:
+    """ASGI middleware counting in-flight turns and rejecting new ones while draining"""
+
+    def __init__(self, app: ASGIApp, coordinator: DrainCoordinator):
+        """
+        Initialize middleware
+
+        Args:
+            app: Wrapped ASGI app
+            coordinator: Drain coordinator
+        """
+        self.app = app
+        self.coordinator = coordinator
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not self.coordinator.applies(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        if self.coordinator.draining:
+            self.coordinator.rejected += 1
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Servidor reiniciándose, inténtalo de nuevo"},
+                headers={"Retry-After": "1", "Connection": "close"}
+            )
+            await response(scope, receive, send)
+            return
+
+        # El turno cuenta hasta que termina el cuerpo en streaming
+        self.coordinator.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.coordinator.exit()
+
+
+# Global coordinator instance
+drain_coordinator = DrainCoordinator(
+    paths=[p.strip() for p in settings.drain_paths.split(",") if p.strip()]
+)
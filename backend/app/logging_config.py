@@ -0,0 +1,172 @@
+"""
+Logging configuration
+Structured (JSON) records written by a background thread, per-request
+correlation IDs and sampling of high-volume INFO logs
+
+Callers only enqueue the LogRecord: the message is formatted (`msg % args`)
+and serialized by the listener thread, so hot paths must log with
+`logger.info("... %s", value)` instead of f-strings.
+"""
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+log_sampled_var: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+# Atributos estándar de LogRecord; el resto son campos `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            data["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the request id and drop unsampled INFO/DEBUG records of hot-path loggers"""
+
+    def __init__(self, sampled_loggers):
+        """
+        Initialize filter
+
+        Args:
+            sampled_loggers: Logger name prefixes subject to sampling
+        """
+        super().__init__()
+        self.sampled_loggers = tuple(sampled_loggers)
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        if (
+            record.levelno < logging.WARNING
+            and not log_sampled_var.get()
+            and record.name.startswith(self.sampled_loggers)
+        ):
+            self.sampled_out += 1
+            return False
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enqueue records as-is (no formatting in the caller) and drop them if the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Mismo proceso: el listener formatea el registro original
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_context_filter: Optional[RequestContextFilter] = None
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Route the root logger through the queue handler (idempotent)"""
+    global _queue_handler, _context_filter, _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if settings.log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'))
+
+    _context_filter = RequestContextFilter(
+        [name.strip() for name in settings.log_sampled_loggers.split(",") if name.strip()]
+    )
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    _queue_handler.addFilter(_context_filter)
+
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(settings.log_level.upper())
+
+    _listener = QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush pending records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logging_metrics() -> Dict[str, int]:
+    """Queue depth, dropped and sampled-out records"""
+    if _queue_handler is None:
+        return {"initialized": False}
+    return {
+        "queue_depth": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sampled_out": _context_filter.sampled_out,
+    }
+
+
+class RequestIdMiddleware:
+    """Assign a correlation id (X-Request-ID) and a sampling decision to each request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming[:64] or uuid.uuid4().hex
+        id_token = request_id_var.set(request_id)
+        sampled_token = log_sampled_var.set(random.random() < settings.log_info_sample_rate)
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append((b"x-request-id", request_id.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(id_token)
+            log_sampled_var.reset(sampled_token)
@@ -3,20 +3,29 @@ Main FastAPI application
 Voice Assistant POC Backend
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.routers import voice_router
-from app.routers import auth
+from app.routers import voice_router, metrics_router, batch_router
+from app.routers import auth, admin
 from app.models.schemas import HealthResponse
-from app.database import init_db
+from app.services.health_service import health_service
+from app.services.job_queue import job_queue
+from app.services.profiler import profiler
+from app.services.openai_service import close_openai_service
+from app.services.semantic_cache import semantic_cache
+from app.services.turn_persistence import turn_persistence_service
+from app.database import dispose_engine
+from app.rate_limit import RateLimitMiddleware, rate_limiter
+from app.drain import DrainMiddleware, drain_coordinator
+from app.compression import CompressionMiddleware
+from app.logging_config import setup_logging, RequestIdMiddleware
+import app.services.background_tasks  # noqa: F401 (registra los handlers de jobs)
 import logging
+import time
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -24,23 +33,51 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
-    logger.info(f"Starting {settings.app_name} v{settings.app_version}")
-    logger.info(f"Environment: {settings.environment}")
-    logger.info(f"CORS origins: {settings.cors_origins}")
+    logger.info("Starting %s v%s", settings.app_name, settings.app_version)
+    logger.info("Environment: %s", settings.environment)
+    logger.info("CORS origins: %s", settings.cors_origins)
     
-    # Inicializar base de datos
-    try:
-        logger.info("Connecting to database...")
-        init_db()
-        logger.info("✅ Database initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Database initialization failed: {str(e)}")
-        logger.warning("⚠️ App will continue without database")
+    # Warm-up en segundo plano: pool de BD, cliente OpenAI y primeros checks.
+    # El esquema se crea con `python -m app.migrate`.
+    # /health/live responde de inmediato; /health/ready espera al warm-up.
+    health_service.start()
+    await job_queue.start()
+    if settings.profiling_enabled:
+        profiler.start_monitor()
+    # SIGTERM pasa readiness a 503 y rechaza turnos nuevos mientras el
+    # servidor espera a las conexiones abiertas
+    drain_coordinator.install_signal_hooks()
     
     yield
     
-    # Shutdown
-    logger.info(f"Shutting down {settings.app_name}")
+    # Shutdown: drenar turnos en curso, vaciar escrituras y cerrar clientes
+    logger.info("Shutting down %s", settings.app_name)
+    drain_coordinator.begin_drain()
+    started = drain_coordinator.drain_started_at
+    abandoned = 0
+    if not await drain_coordinator.wait_idle(settings.shutdown_drain_timeout_seconds):
+        abandoned = drain_coordinator.inflight
+        logger.warning("Drain deadline reached with %s voice turns in flight", abandoned)
+    turns_drained_ms = (time.perf_counter() - started) * 1000
+    
+    pending_writes = await turn_persistence_service.flush(settings.shutdown_flush_timeout_seconds)
+    if pending_writes:
+        logger.warning("%s turn writes still pending at shutdown", pending_writes)
+    await semantic_cache.close()
+    await job_queue.stop(timeout=settings.shutdown_flush_timeout_seconds)
+    await profiler.stop_monitor()
+    await health_service.stop()
+    await close_openai_service()
+    dispose_engine()
+    
+    drain_coordinator.last_drain = {
+        "turns_drained_ms": round(turns_drained_ms, 1),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "abandoned_turns": abandoned,
+        "pending_writes": pending_writes,
+        "rejected_turns": drain_coordinator.rejected,
+    }
+    logger.info("Shutdown complete", extra={"drain": drain_coordinator.last_drain})
 
 
 # Create FastAPI application
@@ -53,6 +90,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Rate limiting por usuario/IP antes de leer el body (CORS queda por fuera
+# para que las respuestas 429 lleven sus cabeceras)
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
+# Turnos de voz en curso / rechazo de turnos nuevos durante el apagado
+app.add_middleware(DrainMiddleware, coordinator=drain_coordinator)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -62,24 +107,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli para respuestas JSON completas (el audio en streaming no se toca)
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
+# Correlation id por petición (X-Request-ID) y muestreo de logs
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(voice_router)
+app.include_router(batch_router)
+app.include_router(metrics_router)
+if settings.profiling_enabled:
+    app.include_router(admin.router)
 
 
-@app.get("/", response_model=HealthResponse)
-async def root():
-    """Root endpoint - Health check"""
+def _readiness_response(response: Response) -> HealthResponse:
+    """Construir respuesta a partir del estado de readiness en caché"""
+    ready = health_service.ready and not drain_coordinator.draining
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
     return HealthResponse(
-        status="healthy",
-        version=settings.app_version
+        status="healthy" if ready else ("draining" if drain_coordinator.draining else "unavailable"),
+        version=settings.app_version,
+        checks=health_service.snapshot()
     )
 
 
+@app.get("/", response_model=HealthResponse)
+async def root(response: Response):
+    """Root endpoint - Health check"""
+    return _readiness_response(response)
+
+
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
-    """Health check endpoint"""
+async def health_check(response: Response):
+    """Health check endpoint (same as readiness)"""
+    return _readiness_response(response)
+
+
+@app.get("/health/live", response_model=HealthResponse)
+async def liveness():
+    """Liveness probe - the process is up and serving requests"""
     return HealthResponse(
-        status="healthy",
+        status="alive",
         version=settings.app_version
-    )
\ No newline at end of file
+    )
+
+
+@app.get("/health/ready", response_model=HealthResponse)
+async def readiness(response: Response):
+    """Readiness probe - cached DB and OpenAI checks, 503 until warm-up completes"""
+    return _readiness_response(response)
@@ -0,0 +1,12 @@
+"""
+Explicit schema migration step
+Creates/verifies database tables before deploying the application
+
+Usage:
+    python -m app.migrate
+"""
+from app.database import init_db
+
+
+if __name__ == "__main__":
+    init_db()
@@ -5,6 +5,8 @@ from .schemas import (
     ChatRequest,
     ChatResponse,
     TTSRequest,
+    BatchTTSRequest,
+    BatchJobStatus,
     HealthResponse
 )
 
@@ -14,5 +16,7 @@ __all__ = [
     "ChatRequest",
     "ChatResponse",
     "TTSRequest",
+    "BatchTTSRequest",
+    "BatchJobStatus",
     "HealthResponse"
 ]
\ No newline at end of file
@@ -2,7 +2,7 @@
 Pydantic models for request and response validation
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 
@@ -34,9 +34,15 @@ class UserResponse(BaseModel):
 class Token(BaseModel):
     """Modelo de token JWT"""
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
+    expires_in: Optional[int] = None
     user: UserResponse
 
+class RefreshRequest(BaseModel):
+    """Petición de renovación o revocación de tokens"""
+    refresh_token: str
+
 class ConversationDB(BaseModel):
     """Conversación en base de datos"""
     conversation_id: Optional[int] = None
@@ -75,6 +81,11 @@ class ChatRequest(BaseModel):
         default_factory=list,
         description="Previous conversation messages"
     )
+    persona: Optional[str] = Field(
+        None,
+        pattern=r"^[a-z0-9_-]+$",
+        description="Persona (defaults to PERSONA)"
+    )
 
 
 class ChatResponse(BaseModel):
@@ -89,8 +100,26 @@ class TTSRequest(BaseModel):
     voice: Optional[str] = Field(None, description="Voice option (alloy, echo, fable, onyx, nova, shimmer)")
 
 
+class BatchTTSRequest(BaseModel):
+    """Request model for batch text-to-speech"""
+    items: List[TTSRequest] = Field(..., description="Texts to convert to speech")
+
+
+class BatchJobStatus(BaseModel):
+    """Progress of a batch job"""
+    job_id: str
+    kind: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
     version: str
-    timestamp: datetime = Field(default_factory=datetime.now)
\ No newline at end of file
+    timestamp: datetime = Field(default_factory=datetime.now)
+    checks: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="Cached dependency checks")
\ No newline at end of file
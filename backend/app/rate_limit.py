@@ -0,0 +1,346 @@
+"""
+Rate limiting middleware
+Token buckets per user (JWT subject) and per client IP, checked before the
+request body is read so rejected uploads are never buffered. Batch requests
+are charged per item by the batch router once the item count is known
+
+Stores (settings.rate_limit_store):
+- "memory": per-process buckets (one worker)
+- "redis": buckets shared by every worker through an atomic Lua script
+  (requires the optional `redis` package)
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.config import settings
+from app.auth import decode_access_token
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+# (clave, peticiones por minuto, ráfaga, tokens a consumir)
+Bucket = Tuple[str, float, int, int]
+
+
+class MemoryBucketStore:
+    """In-process token buckets (LRU-bounded)"""
+
+    def __init__(self, max_keys: int = 100000):
+        """
+        Initialize store
+
+        Args:
+            max_keys: Buckets kept before the least recently used is dropped
+        """
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, buckets: List[Bucket]) -> float:
+        """
+        Take each bucket's cost from every bucket, or nothing if any is short
+
+        Args:
+            buckets: (key, per_minute, burst, cost) of each bucket
+
+        Returns:
+            0 if allowed, otherwise seconds until every bucket has enough tokens
+        """
+        now = time.monotonic()
+        refilled = []
+        wait = 0.0
+        for key, per_minute, burst, cost in buckets:
+            rate = per_minute / 60
+            tokens, updated = self._buckets.get(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+            if tokens < cost:
+                wait = max(wait, (cost - tokens) / rate)
+            refilled.append((key, tokens, cost))
+        for key, tokens, cost in refilled:
+            self._buckets[key] = (tokens - cost if wait == 0 else tokens, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# Buckets atómicos en Redis (todos o ninguno): tokens y marca de tiempo en
+# un hash con TTL; ARGV lleva rate, burst y coste de cada clave
+_REDIS_TAKE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+  local rate = tonumber(ARGV[3 * i - 2])
+  local burst = tonumber(ARGV[3 * i - 1])
+  local cost = tonumber(ARGV[3 * i])
+  local data = redis.call('HMGET', key, 'tokens', 'ts')
+  local current = tonumber(data[1]) or burst
+  local ts = tonumber(data[2]) or now
+  current = math.min(burst, current + (now - ts) * rate)
+  if current < cost then
+    wait = math.max(wait, (cost - current) / rate)
+  end
+  tokens[i] = current
+end
+for i, key in ipairs(KEYS) do
+  local rate = tonumber(ARGV[3 * i - 2])
+  local burst = tonumber(ARGV[3 * i - 1])
+  local current = tokens[i]
+  if wait == 0 then
+    current = current - tonumber(ARGV[3 * i])
+  end
+  redis.call('HSET', key, 'tokens', tostring(current), 'ts', tostring(now))
+  redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    """Token buckets shared across workers through Redis"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        """
+        Initialize store
+
+        Args:
+            url: Redis URL
+            prefix: Key prefix
+        """
+        # Dependencia opcional: solo necesaria con RATE_LIMIT_STORE=redis
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(_REDIS_TAKE)
+
+    async def take(self, buckets: List[Bucket]) -> float:
+        """Take each cost from every shared bucket or nothing (see MemoryBucketStore.take)"""
+        args = []
+        for _, per_minute, burst, cost in buckets:
+            args.extend([per_minute / 60, burst, cost])
+        wait = await self._script(keys=[self.prefix + key for key, _, _, _ in buckets], args=args)
+        return float(wait)
+
+
+class RateLimiter:
+    """Per-user and per-IP limits with counters"""
+
+    def __init__(
+        self,
+        store,
+        paths: List[str],
+        segment_paths: List[str],
+        batch_paths: List[str],
+        methods: List[str],
+        user_per_minute: float,
+        user_burst: int,
+        segment_per_minute: float,
+        segment_burst: int,
+        batch_items_per_minute: float,
+        batch_items_burst: int,
+        ip_per_minute: float,
+        ip_burst: int
+    ):
+        """
+        Initialize limiter
+
+        Args:
+            store: Bucket store
+            paths: Path prefixes the limits apply to
+            segment_paths: Path prefixes of audio segment uploads, charged
+                to a separate per-user bucket instead of the turn bucket
+            batch_paths: Path prefixes of batch requests; they skip the turn
+                bucket and are charged per item through check_batch_items
+            methods: HTTP methods that are limited
+            user_per_minute / user_burst: Bucket for each JWT subject
+            segment_per_minute / segment_burst: Segment bucket for each JWT subject
+            batch_items_per_minute / batch_items_burst: Batch item bucket for
+                each JWT subject (the burst caps the largest batch accepted)
+            ip_per_minute / ip_burst: Bucket for each client IP
+        """
+        self.store = store
+        self.paths = paths
+        self.segment_paths = segment_paths
+        self.batch_paths = batch_paths
+        self.methods = methods
+        self.user_per_minute = user_per_minute
+        self.user_burst = user_burst
+        self.segment_per_minute = segment_per_minute
+        self.segment_burst = segment_burst
+        self.batch_items_per_minute = batch_items_per_minute
+        self.batch_items_burst = batch_items_burst
+        self.ip_per_minute = ip_per_minute
+        self.ip_burst = ip_burst
+        self.counters = {"allowed": 0, "limited": 0, "store_errors": 0}
+
+    def applies(self, method: str, path: str) -> bool:
+        """Whether a request is rate limited"""
+        return method in self.methods and any(path.startswith(prefix) for prefix in self.paths)
+
+    def is_segment(self, path: str) -> bool:
+        """Whether a path is an audio segment upload"""
+        return any(path.startswith(prefix) for prefix in self.segment_paths)
+
+    def is_batch(self, path: str) -> bool:
+        """Whether a path is a batch request"""
+        return any(path.startswith(prefix) for prefix in self.batch_paths)
+
+    async def check(
+        self,
+        subject: Optional[str],
+        ip: Optional[str],
+        segment: bool = False,
+        batch: bool = False
+    ) -> float:
+        """
+        Consume one request for the user and the IP
+
+        Args:
+            subject: JWT subject (None for anonymous or invalid tokens)
+            ip: Client IP
+            segment: Charge the user's segment bucket instead of the turn bucket
+            batch: Skip the user's buckets (the batch router charges per item)
+
+        Returns:
+            0 if allowed, otherwise seconds the client must wait
+        """
+        buckets: List[Bucket] = []
+        if subject is not None and segment and self.segment_per_minute > 0:
+            buckets.append((f"segment:{subject}", self.segment_per_minute, self.segment_burst, 1))
+        elif subject is not None and not segment and not batch and self.user_per_minute > 0:
+            buckets.append((f"user:{subject}", self.user_per_minute, self.user_burst, 1))
+        if ip is not None and self.ip_per_minute > 0:
+            buckets.append((f"ip:{ip}", self.ip_per_minute, self.ip_burst, 1))
+        return await self._take(buckets)
+
+    async def check_batch_items(self, subject: str, items: int) -> float:
+        """
+        Consume one token per batch item for the user
+
+        Each item is an upstream STT/TTS call, so a batch costs as much as
+        the same number of individual requests.
+
+        Args:
+            subject: JWT subject
+            items: Number of items in the batch
+
+        Returns:
+            0 if allowed, otherwise seconds the client must wait
+        """
+        if self.batch_items_per_minute <= 0:
+            return 0.0
+        return await self._take([
+            (f"batch:{subject}", self.batch_items_per_minute, self.batch_items_burst, items)
+        ])
+
+    async def _take(self, buckets: List[Bucket]) -> float:
+        try:
+            # Se consume de todos los buckets o de ninguno
+            wait = await self.store.take(buckets) if buckets else 0.0
+            if wait > 0:
+                self.counters["limited"] += 1
+                return wait
+        except Exception as e:
+            # Si el almacén compartido falla se deja pasar la petición
+            self.counters["store_errors"] += 1
+            logger.warning("Rate limit store error: %s", e)
+        self.counters["allowed"] += 1
+        return 0.0
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get counters"""
+        return dict(self.counters)
+
+
+TRUSTED_PROXIES = {p.strip() for p in settings.rate_limit_trusted_proxies.split(",") if p.strip()}
+
+
+def _client_ip(scope: Scope, headers: Dict[bytes, bytes]) -> Optional[str]:
+    client = scope.get("client")
+    ip = client[0] if client else None
+    if ip not in TRUSTED_PROXIES or b"x-forwarded-for" not in headers:
+        return ip
+    # El cliente controla los valores de la izquierda: recorrer desde la
+    # derecha saltando nuestros proxies y quedarse con el primer salto ajeno
+    hops = [hop.strip() for hop in headers[b"x-forwarded-for"].decode("latin-1").split(",")]
+    for hop in reversed(hops):
+        if hop and hop not in TRUSTED_PROXIES:
+            return hop
+    return ip
+
+
+class RateLimitMiddleware:
+    """ASGI middleware rejecting over-limit requests with 429 + Retry-After"""
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter):
+        """
+        Initialize middleware
+
+        Args:
+            app: Wrapped ASGI app
+            limiter: Rate limiter
+        """
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.limiter.applies(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        subject = None
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        if authorization.lower().startswith("bearer "):
+            try:
+                payload = decode_access_token(authorization[7:])
+                subject = payload.get("sub")
+                # get_current_user reutiliza el token ya verificado
+                scope.setdefault("state", {})["token_payload"] = payload
+            except Exception:
+                subject = None
+
+        wait = await self.limiter.check(
+            subject,
+            _client_ip(scope, headers),
+            segment=self.limiter.is_segment(scope["path"]),
+            batch=self.limiter.is_batch(scope["path"])
+        )
+        if wait > 0:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Demasiadas peticiones, inténtalo más tarde"},
+                headers={"Retry-After": str(max(1, math.ceil(wait)))}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def _create_store():
+    if settings.rate_limit_store == "redis":
+        return RedisBucketStore(settings.redis_url)
+    return MemoryBucketStore()
+
+
+# Global limiter instance
+rate_limiter = RateLimiter(
+    store=_create_store(),
+    paths=[p.strip() for p in settings.rate_limit_paths.split(",") if p.strip()],
+    segment_paths=[p.strip() for p in settings.rate_limit_segment_paths.split(",") if p.strip()],
+    batch_paths=[p.strip() for p in settings.rate_limit_batch_paths.split(",") if p.strip()],
+    methods=[m.strip().upper() for m in settings.rate_limit_methods.split(",") if m.strip()],
+    user_per_minute=settings.rate_limit_user_per_minute,
+    user_burst=settings.rate_limit_user_burst,
+    segment_per_minute=settings.rate_limit_segment_per_minute,
+    segment_burst=settings.rate_limit_segment_burst,
+    batch_items_per_minute=settings.rate_limit_batch_items_per_minute,
+    batch_items_burst=settings.rate_limit_batch_items_burst,
+    ip_per_minute=settings.rate_limit_ip_per_minute,
+    ip_burst=settings.rate_limit_ip_burst
+)
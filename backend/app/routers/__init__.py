@@ -1,4 +1,6 @@
 """Routers package"""
 from .voice import router as voice_router
+from .metrics import router as metrics_router
+from .batch import router as batch_router
 
-__all__ = ["voice_router"]
\ No newline at end of file
+__all__ = ["voice_router", "metrics_router", "batch_router"]
\ No newline at end of file
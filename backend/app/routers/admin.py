@@ -0,0 +1,68 @@
+"""
+Admin endpoints for live profiling
+Only mounted when PROFILING_ENABLED is set and only for ADMIN_USERNAMES
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.auth import get_current_active_user, TokenUser
+from app.config import settings
+from app.services.profiler import profiler
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(current_user: TokenUser = Depends(get_current_active_user)) -> TokenUser:
+    """Permitir solo a los usuarios de ADMIN_USERNAMES"""
+    admins = {name.strip() for name in settings.admin_usernames.split(",") if name.strip()}
+    if current_user.username not in admins:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    return current_user
+
+
+router = APIRouter(
+    prefix="/api/admin/profiling",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+
+@router.post("/start")
+async def start_profiling(
+    duration: float = Query(30, gt=0),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    slow_callback_ms: float = Query(settings.profiling_slow_callback_ms, gt=0)
+):
+    """Abrir una ventana de profiling por muestreo y captura de callbacks lentos"""
+    if duration > settings.profiling_max_duration_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"duration must be <= {settings.profiling_max_duration_seconds} s"
+        )
+    try:
+        session = profiler.start_session(duration, interval_ms / 1000, slow_callback_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "started", "started_at": session.started_at, "duration_seconds": duration}
+
+
+@router.get("/report")
+async def get_profiling_report(top: int = Query(20, ge=1, le=200)):
+    """Resultado de la última ventana (parcial si sigue abierta)"""
+    if profiler.session is None:
+        raise HTTPException(status_code=404, detail="No hay sesiones de profiling")
+    return {
+        **profiler.session.report(top),
+        "event_loop_lag": profiler.loop_monitor.snapshot(),
+    }
+
+
+@router.get("/loop-lag")
+async def get_loop_lag():
+    """Retardo reciente del event loop"""
+    return profiler.loop_monitor.snapshot()
+
+
+@router.get("/stacks")
+async def dump_stacks():
+    """Pila actual de cada hilo y de cada tarea asyncio"""
+    return profiler.dump_stacks()
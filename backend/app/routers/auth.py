@@ -3,14 +3,19 @@ Authentication endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from jose import JWTError
+from typing import Optional
 from app.database import get_db, User
-from app.models.schemas import UserCreate, UserLogin, Token, UserResponse
+from app.models.schemas import UserCreate, UserLogin, Token, UserResponse, RefreshRequest
 from app.auth import (
     get_password_hash,
     verify_password,
-    create_access_token,
-    get_current_active_user,
+    create_token_pair,
+    decode_token,
+    get_current_user,
+    get_token_payload,
+    revocation_list,
+    TOKEN_TYPE_REFRESH,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 import logging
@@ -50,14 +55,10 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(new_user)
         
-        logger.info(f"Usuario registrado: {new_user.username}")
+        logger.info("Usuario registrado: %s", new_user.username)
         
-        # Crear token
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": new_user.username},
-            expires_delta=access_token_expires
-        )
+        # Crear tokens
+        tokens = create_token_pair(new_user)
         
         user_response = UserResponse(
             user_id=new_user.user_id,
@@ -68,12 +69,12 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             created_at=new_user.created_at
         )
         
-        return Token(access_token=access_token, user=user_response)
+        return Token(**tokens, expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60, user=user_response)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error en registro: {str(e)}")
+        logger.error("Error en registro: %s", e)
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -101,14 +102,10 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
                 detail="Usuario inactivo"
             )
         
-        # Crear token
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.username},
-            expires_delta=access_token_expires
-        )
+        # Crear tokens
+        tokens = create_token_pair(user)
         
-        logger.info(f"Usuario login: {user.username}")
+        logger.info("Usuario login: %s", user.username)
         
         user_response = UserResponse(
             user_id=user.user_id,
@@ -119,20 +116,83 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
             created_at=user.created_at
         )
         
-        return Token(access_token=access_token, user=user_response)
+        return Token(**tokens, expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60, user=user_response)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error en login: {str(e)}")
+        logger.error("Error en login: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al iniciar sesión"
         )
 
 
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Renovar tokens con un refresh token (el anterior queda revocado)"""
+    try:
+        payload = decode_token(request.refresh_token, TOKEN_TYPE_REFRESH)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # La renovación sí consulta la BD: un usuario desactivado deja de renovar
+    user = db.query(User).filter(User.username == payload["sub"]).first()
+    if not user or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario inactivo",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    revocation_list.revoke(payload["jti"], payload["exp"])
+    
+    user_response = UserResponse(
+        user_id=user.user_id,
+        username=user.username,
+        email=user.email,
+        full_name=user.full_name,
+        is_active=user.is_active,
+        created_at=user.created_at
+    )
+    
+    return Token(**create_token_pair(user), expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60, user=user_response)
+
+
+@router.post("/logout")
+async def logout(
+    request: Optional[RefreshRequest] = None,
+    payload: dict = Depends(get_token_payload)
+):
+    """Revocar el access token actual y, si se envía, su refresh token"""
+    revocation_list.revoke(payload["jti"], payload["exp"])
+    if request is None:
+        logger.info("Usuario logout: %s", payload["sub"])
+        return {"status": "logged_out"}
+    try:
+        refresh_payload = decode_token(request.refresh_token, TOKEN_TYPE_REFRESH)
+        if refresh_payload["sub"] == payload["sub"]:
+            revocation_list.revoke(refresh_payload["jti"], refresh_payload["exp"])
+    except JWTError:
+        pass
+    logger.info("Usuario logout: %s", payload["sub"])
+    return {"status": "logged_out"}
+
+
+@router.post("/logout-all")
+async def logout_all(payload: dict = Depends(get_token_payload)):
+    """Revocar todos los tokens emitidos hasta ahora para el usuario (cerrar sesión en todos los dispositivos)"""
+    revocation_list.revoke_user(payload["sub"])
+    logger.info("Usuario logout en todos los dispositivos: %s", payload["sub"])
+    return {"status": "logged_out"}
+
+
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_active_user)):
+async def get_me(current_user: User = Depends(get_current_user)):
     """Obtener información del usuario actual"""
     return UserResponse(
         user_id=current_user.user_id,
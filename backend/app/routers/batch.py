@@ -0,0 +1,145 @@
+"""
+Batch endpoints for offline transcription and synthesis
+Results are streamed as NDJSON, one line per item as soon as it completes
+"""
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from typing import List
+from app.services.openai_service import OpenAIService, get_openai_service
+from app.services.batch_service import batch_service, BatchJob
+from app.services.tts_coalescer import tts_coalescer
+from app.services.upstream_scheduler import PRIORITY_BATCH
+from app.models.schemas import BatchTTSRequest, BatchJobStatus
+from app.auth import get_current_active_user, TokenUser
+from app.config import settings
+from app.rate_limit import rate_limiter
+import base64
+import io
+import json
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/voice/batch", tags=["batch"])
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _ndjson_stream(job: BatchJob, results):
+    """Serializar el job y sus resultados como NDJSON"""
+    async def stream():
+        yield json.dumps({"job": job.to_dict()}, default=str) + "\n"
+        async for result in results:
+            yield json.dumps(result, default=str) + "\n"
+        yield json.dumps({"job": job.to_dict()}, default=str) + "\n"
+    return StreamingResponse(
+        stream(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"X-Job-Id": job.job_id}
+    )
+
+
+def _max_batch_items() -> int:
+    if settings.rate_limit_enabled and rate_limiter.batch_items_per_minute > 0:
+        # Un lote mayor que la ráfaga nunca tendría tokens suficientes
+        return min(settings.batch_max_items, rate_limiter.batch_items_burst)
+    return settings.batch_max_items
+
+
+async def _check_batch(count: int, current_user: TokenUser) -> None:
+    """Validar el tamaño del lote y cobrar un token de rate limit por elemento"""
+    max_items = _max_batch_items()
+    if count == 0:
+        raise HTTPException(status_code=400, detail="El lote está vacío")
+    if count > max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Máximo {max_items} elementos por lote"
+        )
+    if not settings.rate_limit_enabled:
+        return
+    wait = await rate_limiter.check_batch_items(current_user.username, count)
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiadas peticiones, inténtalo más tarde",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))}
+        )
+
+
+@router.post("/transcribe")
+async def batch_transcribe(
+    audios: List[UploadFile] = File(...),
+    current_user: TokenUser = Depends(get_current_active_user),
+    openai_service: OpenAIService = Depends(get_openai_service)
+):
+    """
+    Transcribir muchos archivos de audio en un solo request
+    """
+    await _check_batch(len(audios), current_user)
+    
+    # Leer los archivos antes de empezar el streaming (se cierran al salir del handler)
+    items = []
+    for audio in audios:
+        items.append((audio.filename or "audio.wav", await audio.read()))
+    
+    job = batch_service.create_job("transcribe", current_user.user_id, len(items))
+    logger.info("User %s - Batch transcription %s: %s files", current_user.username, job.job_id, len(items))
+    
+    async def transcribe_item(item):
+        filename, audio_bytes = item
+        audio_file = io.BytesIO(audio_bytes)
+        audio_file.name = filename
+        text = await openai_service.transcribe_audio(
+            audio_file,
+            priority=PRIORITY_BATCH,
+            timeout_seconds=settings.batch_stage_timeout_seconds
+        )
+        return {"filename": filename, "text": text}
+    
+    return _ndjson_stream(job, batch_service.run(job, items, transcribe_item))
+
+
+@router.post("/tts")
+async def batch_text_to_speech(
+    request: BatchTTSRequest,
+    current_user: TokenUser = Depends(get_current_active_user),
+    openai_service: OpenAIService = Depends(get_openai_service)
+):
+    """
+    Sintetizar muchos textos en un solo request (audio MP3 en base64)
+    """
+    await _check_batch(len(request.items), current_user)
+    
+    job = batch_service.create_job("tts", current_user.user_id, len(request.items))
+    logger.info("User %s - Batch TTS %s: %s items", current_user.username, job.job_id, len(request.items))
+    
+    async def synthesize_item(item):
+        audio = await tts_coalescer.synthesize(
+            openai_service,
+            text=item.text,
+            voice=item.voice,
+            priority=PRIORITY_BATCH,
+            timeout_seconds=settings.batch_stage_timeout_seconds
+        )
+        return {
+            "bytes": len(audio),
+            "audio_base64": base64.b64encode(audio).decode("ascii")
+        }
+    
+    return _ndjson_stream(job, batch_service.run(job, request.items, synthesize_item))
+
+
+@router.get("/jobs/{job_id}", response_model=BatchJobStatus)
+async def get_batch_job(
+    job_id: str,
+    current_user: TokenUser = Depends(get_current_active_user)
+):
+    """Consultar el progreso de un lote"""
+    job = batch_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Lote no encontrado")
+    if job.user_id != current_user.user_id:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    return BatchJobStatus(**job.to_dict())
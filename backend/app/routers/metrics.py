@@ -0,0 +1,61 @@
+"""
+Operational metrics endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from app.database import get_pool_metrics
+from app.services.turn_persistence import turn_persistence_service
+from app.services.upstream_scheduler import upstream_scheduler
+from app.services.resilience import resilience_stats
+from app.services.tts_coalescer import tts_coalescer
+from app.services.job_queue import job_queue
+from app.services.prompt_service import prompt_service
+from app.services.model_router import model_router
+from app.services.semantic_cache import semantic_cache
+from app.services.segmented_upload import segmented_upload_service
+from app.rate_limit import rate_limiter
+from app.drain import drain_coordinator
+from app.compression import compression_stats
+from app.auth import get_current_active_user, verification_cache, TokenUser
+from app.logging_config import get_logging_metrics
+from app.routers.admin import require_admin
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+
+@router.get("", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    """Métricas del pool de BD, persistencia de turnos y llamadas a OpenAI (solo administradores)"""
+    return {
+        "database_pool": get_pool_metrics(),
+        "turn_persistence": {
+            **turn_persistence_service.stats.snapshot(),
+            "pending_writes": turn_persistence_service.pending_writes,
+        },
+        "upstream": upstream_scheduler.snapshot(),
+        "resilience": resilience_stats.snapshot(),
+        "tts_coalescing": tts_coalescer.snapshot(),
+        "jobs": job_queue.snapshot(),
+        "prompt_cache": prompt_service.cache_stats.snapshot(),
+        "routes": model_router.snapshot(),
+        "semantic_cache": semantic_cache.snapshot(),
+        "segmented_uploads": segmented_upload_service.snapshot(),
+        "rate_limit": rate_limiter.snapshot(),
+        "token_cache": verification_cache.snapshot(),
+        "logging": get_logging_metrics(),
+        "drain": drain_coordinator.snapshot(),
+        "compression": compression_stats.snapshot(),
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: str,
+    current_user: TokenUser = Depends(get_current_active_user)
+):
+    """Estado de un job en segundo plano (solo para su dueño)"""
+    status = job_queue.get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    if status["user_id"] != current_user.user_id:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    return status
@@ -1,36 +1,86 @@
 """
 Voice endpoints for transcription, chat, and TTS
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Header, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.services.openai_service import OpenAIService
+from app.services.openai_service import OpenAIService, get_openai_service
+from app.services.conversation_resolver import active_conversation_resolver
+from app.services.turn_persistence import turn_persistence_service, TurnUsage
+from app.services.usage_report import get_daily_usage
+from app.services.segmented_upload import segmented_upload_service
+from app.services.upstream_scheduler import PRIORITY_BATCH
+from app.services.resilience import TurnDeadline
+from app.services.tts_coalescer import tts_coalescer
+from app.services.model_router import model_router, Route
+from app.services.semantic_cache import semantic_cache, SemanticLookup
+from app.services import voice_frames
 from app.models.schemas import TranscriptionResponse, ChatRequest, ChatResponse, TTSRequest
-from app.database import get_db, Conversation, Message, User
-from app.auth import get_current_active_user
+from app.database import get_db, Conversation, Message
+from app.auth import get_current_active_user, TokenUser
 from datetime import datetime
+from typing import Optional
 import asyncio
 import base64
+import hashlib
 import io
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/voice", tags=["voice"])
 
-openai_service = OpenAIService()
+
+def _select_route(message: str, persona: Optional[str], user_id: int) -> Route:
+    """Elegir modelo, voz y max_tokens para el turno (fijados por conversación activa)"""
+    try:
+        return model_router.route(
+            message,
+            persona_key=persona,
+            conversation_id=active_conversation_resolver.get_cached(user_id)
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=400, detail=f"Persona desconocida: {persona}")
+
+
+def _cache_scope(route: Route) -> str:
+    """Ámbito de la caché semántica: las respuestas dependen de la persona y el audio de la voz"""
+    return f"{route.persona.key}/{route.voice}"
+
+
+# Historiales: se revalidan con If-None-Match en cada apertura
+HISTORY_CACHE_CONTROL = "private, no-cache"
+
+
+def _history_etag(*parts) -> str:
+    """ETag débil (la representación varía con la compresión)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": HISTORY_CACHE_CONTROL})
 
 
 @router.post("/transcribe", response_model=TranscriptionResponse)
 async def transcribe_audio(
     audio: UploadFile = File(...),
-    current_user: User = Depends(get_current_active_user)
+    current_user: TokenUser = Depends(get_current_active_user),
+    openai_service: OpenAIService = Depends(get_openai_service)
 ):
     """
     Transcribe audio to text using Whisper
     """
     try:
-        logger.info(f"User {current_user.username} - Transcribing audio file: {audio.filename}")
+        logger.info("User %s - Transcribing audio file: %s", current_user.username, audio.filename)
         
         audio_bytes = await audio.read()
         audio_file = io.BytesIO(audio_bytes)
@@ -41,21 +91,23 @@ async def transcribe_audio(
         return TranscriptionResponse(text=text)
         
     except Exception as e:
-        logger.error(f"Transcription error: {str(e)}")
+        logger.error("Transcription error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_completion(
     request: ChatRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: TokenUser = Depends(get_current_active_user),
+    openai_service: OpenAIService = Depends(get_openai_service)
 ):
     """
     Get chat completion from GPT y guardar en BD
     """
+    route = _select_route(request.message, request.persona, current_user.user_id)
+    
     try:
-        logger.info(f"User {current_user.username} - Chat request: {request.message[:50]}...")
+        logger.info("User %s - Chat request: %.50s...", current_user.username, request.message)
         
         # Convert conversation history to API format
         history = [
@@ -63,62 +115,40 @@ async def chat_completion(
             for msg in request.conversation_history
         ]
         
-        # Get completion usando el método correcto
-        response = await openai_service.get_chat_completion_stream(
-            message=request.message,
-            conversation_history=history
-        )
+        usage = TurnUsage()
+        
+        # Solo las preguntas sin contexto previo pueden reutilizar respuestas
+        cached = None
+        if not history:
+            cached = await semantic_cache.lookup(openai_service, request.message, _cache_scope(route))
+        
+        if cached and cached.hit:
+            response = cached.entry.answer
+        else:
+            # Get completion usando el método correcto
+            response = await openai_service.get_chat_completion_stream(
+                message=request.message,
+                conversation_history=history,
+                route=route,
+                usage=usage
+            )
+            await semantic_cache.store(cached, response)
         
         # Update conversation history
         updated_history = request.conversation_history.copy()
         updated_history.append({"role": "user", "content": request.message})
         updated_history.append({"role": "assistant", "content": response})
         
-        # GUARDAR EN BD
-        try:
-            conversation = db.query(Conversation).filter(
-                Conversation.user_id == current_user.user_id
-            ).order_by(Conversation.updated_at.desc()).first()
-            
-            if not conversation:
-                conversation = Conversation(
-                    user_id=current_user.user_id,
-                    title=f"Conversación {datetime.now().strftime('%d/%m %H:%M')}",
-                    created_at=datetime.now(),
-                    updated_at=datetime.now()
-                )
-                db.add(conversation)
-                db.commit()
-                db.refresh(conversation)
-                logger.info(f"Nueva conversación creada: {conversation.conversation_id}")
-            
-            # Guardar mensaje del usuario
-            user_message = Message(
-                conversation_id=conversation.conversation_id,
-                role="user",
-                content=request.message,
-                created_at=datetime.now()
-            )
-            db.add(user_message)
-            
-            # Guardar respuesta del asistente
-            assistant_message = Message(
-                conversation_id=conversation.conversation_id,
-                role="assistant",
-                content=response,
-                created_at=datetime.now()
-            )
-            db.add(assistant_message)
-            
-            # Actualizar timestamp de conversación
-            conversation.updated_at = datetime.now()
-            
-            db.commit()
-            logger.info(f"Mensajes guardados en conversación {conversation.conversation_id}")
-            
-        except Exception as db_error:
-            logger.error(f"Error guardando en BD: {str(db_error)}")
-            db.rollback()
+        # GUARDAR EN BD (un solo commit por turno, en un hilo: no bloquea el loop).
+        # Se espera antes de responder para que el historial ya incluya el turno;
+        # los errores se registran en persist_turn_background (shield: si el
+        # cliente se desconecta la escritura sigue contando para el flush)
+        await asyncio.shield(turn_persistence_service.persist_turn_background(
+            user_id=current_user.user_id,
+            user_content=request.message,
+            assistant_content=response,
+            usage=usage
+        ))
         
         return ChatResponse(
             response=response,
@@ -126,28 +156,39 @@ async def chat_completion(
         )
         
     except Exception as e:
-        logger.error(f"Chat endpoint error: {str(e)}")
+        logger.error("Chat endpoint error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/tts")
 async def text_to_speech(
     request: TTSRequest,
-    current_user: User = Depends(get_current_active_user)
+    current_user: TokenUser = Depends(get_current_active_user),
+    openai_service: OpenAIService = Depends(get_openai_service)
 ):
     """
     Convert text to speech
     """
     try:
-        logger.info(f"User {current_user.username} - TTS request: {request.text[:50]}...")
+        logger.info("User %s - TTS request: %.50s...", current_user.username, request.text)
         
-        audio_content = await openai_service.text_to_speech(
+        # Peticiones idénticas concurrentes comparten una sola llamada a OpenAI
+        chunks = tts_coalescer.stream(
+            openai_service,
             text=request.text,
-            voice=request.voice
+            voice=request.voice,
+            priority=PRIORITY_BATCH
         )
+        # Esperar el primer fragmento para poder responder 500 si falla
+        first_chunk = await anext(chunks, b"")
+        
+        async def audio_stream():
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
         
         return StreamingResponse(
-            io.BytesIO(audio_content),
+            audio_stream(),
             media_type="audio/mpeg",
             headers={
                 "Content-Disposition": "attachment; filename=speech.mp3"
@@ -155,102 +196,307 @@ async def text_to_speech(
         )
         
     except Exception as e:
-        logger.error(f"TTS endpoint error: {str(e)}")
+        logger.error("TTS endpoint error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/quick-interaction")
 async def quick_voice_interaction(
     audio: UploadFile = File(...),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: TokenUser = Depends(get_current_active_user),
+    openai_service: OpenAIService = Depends(get_openai_service),
+    framing: str = Query("headers", pattern="^(headers|frames)$"),
+    persona: Optional[str] = Query(None, pattern="^[a-z0-9_-]+$")
 ):
     """
-    Interacción de voz optimizada - procesa TTS en paralelo con guardado en BD
+    Interacción de voz optimizada - el turno se guarda en BD en segundo plano
+    tras el TTS, con sus latencias y consumo
+    
+    framing=headers (por defecto): audio MP3 con transcripción y respuesta
+    en base64 en las cabeceras X-Transcription / X-Response-Text.
+    framing=frames: flujo application/x-voice-frames con la transcripción y
+    el texto primero y después el audio en streaming (ver app.services.voice_frames).
     """
     try:
-        logger.info(f"User {current_user.username} - Quick interaction started")
+        logger.info("User %s - Quick interaction started", current_user.username)
+        deadline = TurnDeadline()
+        usage = TurnUsage()
         
         # 1. Transcribir
         audio_bytes = await audio.read()
         audio_file = io.BytesIO(audio_bytes)
         audio_file.name = audio.filename or "audio.webm"
         
-        transcription = await openai_service.transcribe_audio(audio_file)
-        logger.info(f"✅ Transcription: {transcription}")
+        transcription = await openai_service.transcribe_audio(audio_file, deadline=deadline, usage=usage)
+        logger.debug("✅ Transcription: %s", transcription)
+        
+        return await _answer_transcription(
+            openai_service,
+            user_id=current_user.user_id,
+            transcription=transcription,
+            deadline=deadline,
+            usage=usage,
+            framing=framing,
+            persona=persona
+        )
         
-        # 2. GPT response usando el método correcto
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Quick interaction error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _answer_transcription(
+    openai_service: OpenAIService,
+    user_id: int,
+    transcription: str,
+    deadline: TurnDeadline,
+    usage: TurnUsage,
+    framing: str,
+    persona: Optional[str]
+) -> StreamingResponse:
+    """Responder a un turno ya transcrito: GPT (o caché semántica), TTS y BD"""
+    route = _select_route(transcription, persona, user_id)
+    cached = await semantic_cache.lookup(openai_service, transcription, _cache_scope(route))
+    
+    if framing == "frames":
+        return StreamingResponse(
+            _quick_interaction_frames(
+                openai_service,
+                user_id=user_id,
+                transcription=transcription,
+                deadline=deadline,
+                route=route,
+                cached=cached,
+                usage=usage
+            ),
+            media_type=voice_frames.MEDIA_TYPE
+        )
+    
+    # 2. GPT response (o respuesta equivalente ya cacheada)
+    if cached and cached.hit:
+        response = cached.entry.answer
+    else:
         response = await openai_service.get_chat_completion_stream(
             message=transcription,
-            conversation_history=[]
+            conversation_history=[],
+            deadline=deadline,
+            route=route,
+            usage=usage
         )
-        logger.info(f"✅ GPT response: {response[:50]}...")
-        
-        # 3. TTS y BD en paralelo
-        async def generate_audio():
-            return await openai_service.text_to_speech(text=response)
-        
-        async def save_to_db():
-            try:
-                conversation = db.query(Conversation).filter(
-                    Conversation.user_id == current_user.user_id
-                ).order_by(Conversation.updated_at.desc()).first()
-                
-                if not conversation:
-                    conversation = Conversation(
-                        user_id=current_user.user_id,
-                        title=f"Conversación {datetime.now().strftime('%d/%m %H:%M')}",
-                        created_at=datetime.now(),
-                        updated_at=datetime.now()
-                    )
-                    db.add(conversation)
-                    db.commit()
-                    db.refresh(conversation)
-                    logger.info(f"✅ Nueva conversación: {conversation.conversation_id}")
-                
-                # Guardar mensajes
-                db.add(Message(
-                    conversation_id=conversation.conversation_id,
-                    role="user",
-                    content=transcription,
-                    created_at=datetime.now()
-                ))
-                db.add(Message(
-                    conversation_id=conversation.conversation_id,
-                    role="assistant",
-                    content=response,
-                    created_at=datetime.now()
-                ))
-                conversation.updated_at = datetime.now()
-                db.commit()
-                logger.info(f"✅ Mensajes guardados")
-            except Exception as e:
-                logger.error(f"❌ Error guardando en BD: {str(e)}")
-                db.rollback()
-        
-        # Ejecutar en paralelo
-        audio_response, _ = await asyncio.gather(
-            generate_audio(),
-            save_to_db()
+    logger.debug("✅ GPT response: %.50s...", response)
+    
+    # 3. TTS
+    if cached and cached.audio is not None:
+        audio_response = cached.audio
+    else:
+        tts_start = time.perf_counter()
+        audio_response = await tts_coalescer.synthesize(
+            openai_service,
+            text=response,
+            voice=route.voice,
+            deadline=deadline
         )
-        
+        usage.tts_ms = (time.perf_counter() - tts_start) * 1000
+        usage.tts_characters = len(response)
+    
+    # 4. BD en segundo plano, fuera del camino de la respuesta
+    turn_persistence_service.persist_turn_background(
+        user_id,
+        user_content=transcription,
+        assistant_content=response,
+        usage=usage
+    )
+    await semantic_cache.store(cached, response, audio_response)
+    
+    logger.info("✅ Quick interaction complete")
+    
+    # Codificar en base64
+    transcription_b64 = base64.b64encode(transcription.encode('utf-8')).decode('ascii')
+    response_b64 = base64.b64encode(response.encode('utf-8')).decode('ascii')
+    
+    return StreamingResponse(
+        io.BytesIO(audio_response),
+        media_type="audio/mpeg",
+        headers={
+            "X-Transcription": transcription_b64,
+            "X-Response-Text": response_b64,
+        }
+    )
+
+
+async def _quick_interaction_frames(
+    openai_service: OpenAIService,
+    user_id: int,
+    transcription: str,
+    deadline: TurnDeadline,
+    route: Route,
+    cached: Optional[SemanticLookup] = None,
+    usage: Optional[TurnUsage] = None
+):
+    """Generar los frames de una interacción rápida: texto primero, luego audio"""
+    yield voice_frames.text_frame(voice_frames.FRAME_TRANSCRIPT, transcription)
+    
+    try:
+        if cached and cached.hit:
+            response = cached.entry.answer
+        else:
+            response = await openai_service.get_chat_completion_stream(
+                message=transcription,
+                conversation_history=[],
+                deadline=deadline,
+                route=route,
+                usage=usage
+            )
+        logger.debug("✅ GPT response: %.50s...", response)
+        yield voice_frames.text_frame(voice_frames.FRAME_RESPONSE_TEXT, response)
+    except Exception as e:
+        logger.error("❌ Quick interaction error: %s", e)
+        yield voice_frames.error_frame(str(e))
+        return
+    
+    try:
+        if cached and cached.audio is not None:
+            yield voice_frames.encode_frame(voice_frames.FRAME_AUDIO, cached.audio)
+            yield voice_frames.encode_frame(voice_frames.FRAME_END)
+        else:
+            audio_chunks = []
+            tts_start = time.perf_counter()
+            async for chunk in tts_coalescer.stream(openai_service, text=response, voice=route.voice, deadline=deadline):
+                audio_chunks.append(chunk)
+                yield voice_frames.encode_frame(voice_frames.FRAME_AUDIO, chunk)
+            if usage is not None:
+                usage.tts_ms = (time.perf_counter() - tts_start) * 1000
+                usage.tts_characters = len(response)
+            yield voice_frames.encode_frame(voice_frames.FRAME_END)
+            await semantic_cache.store(cached, response, b"".join(audio_chunks))
         logger.info("✅ Quick interaction complete")
-        
-        # Codificar en base64
-        transcription_b64 = base64.b64encode(transcription.encode('utf-8')).decode('ascii')
-        response_b64 = base64.b64encode(response.encode('utf-8')).decode('ascii')
-        
-        return StreamingResponse(
-            io.BytesIO(audio_response),
-            media_type="audio/mpeg",
-            headers={
-                "X-Transcription": transcription_b64,
-                "X-Response-Text": response_b64,
-            }
+    except Exception as e:
+        logger.error("❌ Quick interaction error: %s", e)
+        yield voice_frames.error_frame(str(e))
+    finally:
+        # La sesión de la dependencia ya se cerró al empezar el streaming
+        turn_persistence_service.persist_turn_background(
+            user_id,
+            user_content=transcription,
+            assistant_content=response,
+            usage=usage
         )
-        
+
+
+@router.post("/utterances")
+async def create_utterance(
+    current_user: TokenUser = Depends(get_current_active_user)
+):
+    """
+    Abrir un enunciado con subida por segmentos
+    
+    El cliente corta la grabación en las pausas (VAD) y sube cada segmento,
+    un fichero de audio completo, a /segments/{utterance_id}?index=N mientras
+    el usuario sigue hablando; el último va a /segments/{utterance_id}/final
+    y la respuesta es la misma que la de /quick-interaction.
+    """
+    return {"utterance_id": segmented_upload_service.create(current_user.user_id)}
+
+
+@router.delete("/utterances/{utterance_id}", status_code=204)
+async def discard_utterance(
+    utterance_id: str,
+    current_user: TokenUser = Depends(get_current_active_user)
+):
+    """Descartar un enunciado (el usuario canceló la grabación)"""
+    try:
+        segmented_upload_service.discard(utterance_id, current_user.user_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Enunciado no encontrado o caducado")
+
+
+@router.post("/segments/{utterance_id}", status_code=202)
+async def upload_segment(
+    utterance_id: str,
+    index: int = Query(..., ge=0),
+    audio: UploadFile = File(...),
+    current_user: TokenUser = Depends(get_current_active_user),
+    openai_service: OpenAIService = Depends(get_openai_service)
+):
+    """Subir un segmento intermedio; se transcribe en segundo plano"""
+    audio_bytes = await audio.read()
+    try:
+        segmented_upload_service.add_segment(
+            openai_service,
+            utterance_id,
+            current_user.user_id,
+            index,
+            audio_bytes,
+            audio.filename or "segment.webm"
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Enunciado no encontrado o caducado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"utterance_id": utterance_id, "index": index}
+
+
+@router.post("/segments/{utterance_id}/final")
+async def upload_final_segment(
+    utterance_id: str,
+    index: int = Query(..., ge=0),
+    audio: Optional[UploadFile] = File(None),
+    current_user: TokenUser = Depends(get_current_active_user),
+    openai_service: OpenAIService = Depends(get_openai_service),
+    framing: str = Query("headers", pattern="^(headers|frames)$"),
+    persona: Optional[str] = Query(None, pattern="^[a-z0-9_-]+$")
+):
+    """
+    Subir el último segmento (o cerrar sin audio si ya se subió con `index`)
+    y responder al turno como /quick-interaction
+    """
+    # El plazo del turno empieza aquí: el resto del enunciado ya se está transcribiendo
+    deadline = TurnDeadline()
+    usage = TurnUsage()
+    try:
+        if audio is not None:
+            segmented_upload_service.add_segment(
+                openai_service,
+                utterance_id,
+                current_user.user_id,
+                index,
+                await audio.read(),
+                audio.filename or "segment.webm"
+            )
+        transcription = await segmented_upload_service.assemble(
+            utterance_id,
+            current_user.user_id,
+            index,
+            usage
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Enunciado no encontrado o caducado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"❌ Quick interaction error: {str(e)}")
+        logger.error("❌ Segmented transcription error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    logger.info(
+        "User %s - Segmented utterance of %s segments assembled (tail %.0f ms)",
+        current_user.username, index + 1, usage.stt_ms
+    )
+    try:
+        return await _answer_transcription(
+            openai_service,
+            user_id=current_user.user_id,
+            transcription=transcription,
+            deadline=deadline,
+            usage=usage,
+            framing=framing,
+            persona=persona
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("❌ Quick interaction error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -258,7 +504,7 @@ async def quick_voice_interaction(
 async def create_conversation(
     user_id: int,
     title: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: TokenUser = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Crear nueva conversación"""
@@ -278,7 +524,10 @@ async def create_conversation(
         db.commit()
         db.refresh(conversation)
         
-        logger.info(f"Conversación creada: {conversation.conversation_id}")
+        # La nueva conversación pasa a ser la activa del usuario
+        active_conversation_resolver.remember(user_id, conversation.conversation_id)
+        
+        logger.info("Conversación creada: %s", conversation.conversation_id)
         
         return {
             "conversation_id": conversation.conversation_id,
@@ -286,16 +535,19 @@ async def create_conversation(
         }
         
     except Exception as e:
-        logger.error(f"Error creando conversación: {str(e)}")
+        logger.error("Error creando conversación: %s", e)
         db.rollback()
+        active_conversation_resolver.invalidate(user_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/conversations/{user_id}")
 async def get_conversations(
     user_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: TokenUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Obtener conversaciones de un usuario"""
     # Verificar que el usuario solo acceda a sus propias conversaciones
@@ -309,6 +561,16 @@ async def get_conversations(
             Conversation.updated_at.desc()
         ).all()
         
+        # El título cambia sin tocar updated_at: entra en el ETag
+        etag = _history_etag("conversations", user_id, *(
+            f"{conv.conversation_id}:{conv.updated_at.isoformat()}:{conv.title}"
+            for conv in conversations
+        ))
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = HISTORY_CACHE_CONTROL
+        
         return [
             {
                 "conversation_id": conv.conversation_id,
@@ -321,15 +583,17 @@ async def get_conversations(
         ]
         
     except Exception as e:
-        logger.error(f"Error obteniendo conversaciones: {str(e)}")
+        logger.error("Error obteniendo conversaciones: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/messages/{conversation_id}")
 async def get_messages(
     conversation_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: TokenUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Obtener mensajes de una conversación"""
     # Verificar que la conversación pertenece al usuario
@@ -343,11 +607,19 @@ async def get_messages(
     if conversation.user_id != current_user.user_id:
         raise HTTPException(status_code=403, detail="No autorizado")
     
+    # Cada turno guardado actualiza updated_at: si no cambió, no hay mensajes nuevos
+    etag = _history_etag("messages", conversation_id, conversation.updated_at.isoformat())
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = HISTORY_CACHE_CONTROL
+    
     try:
         messages = db.query(Message).filter(
             Message.conversation_id == conversation_id
         ).order_by(
-            Message.created_at.asc()
+            Message.created_at.asc(),
+            Message.message_id.asc()
         ).all()
         
         return [
@@ -362,5 +634,19 @@ async def get_messages(
         ]
         
     except Exception as e:
-        logger.error(f"Error obteniendo mensajes: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Error obteniendo mensajes: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/usage")
+async def get_usage(
+    days: int = Query(30, ge=1, le=366),
+    current_user: TokenUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Consumo y coste estimado por día del usuario actual"""
+    try:
+        return get_daily_usage(db, current_user.user_id, days)
+    except Exception as e:
+        logger.error("Error obteniendo consumo: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,12 @@
 """Services package"""
-from .openai_service import openai_service
+from .openai_service import get_openai_service
 from .conversation_service import conversation_service
+from .conversation_resolver import active_conversation_resolver
+from .turn_persistence import turn_persistence_service
 
-__all__ = ["openai_service", "conversation_service"]
\ No newline at end of file
+__all__ = [
+    "get_openai_service",
+    "conversation_service",
+    "active_conversation_resolver",
+    "turn_persistence_service"
+]
\ No newline at end of file
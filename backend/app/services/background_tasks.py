@@ -0,0 +1,65 @@
+"""
+Background job handlers
+Follow-up work that must stay off the voice-turn critical path
+"""
+from app.config import settings
+from app.database import SessionLocal, Conversation, Message, get_engine
+from app.services.job_queue import job_queue
+from app.services.openai_service import get_openai_service
+from app.services.turn_persistence import turn_persistence_service
+from app.services.upstream_scheduler import PRIORITY_BATCH
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+GENERATE_CONVERSATION_TITLE = "generate_conversation_title"
+
+
+def _load_conversation_text(conversation_id: int, max_messages: int = 4) -> str:
+    """Primeros mensajes de la conversación como texto plano"""
+    get_engine()
+    db = SessionLocal()
+    try:
+        messages = db.query(Message.role, Message.content).filter(
+            Message.conversation_id == conversation_id
+        ).order_by(Message.created_at.asc(), Message.message_id.asc()).limit(max_messages).all()
+        return "\n".join(f"{role}: {content}" for role, content in messages)
+    finally:
+        db.close()
+
+
+def _save_title(conversation_id: int, title: str) -> None:
+    get_engine()
+    db = SessionLocal()
+    try:
+        # No se toca updated_at: el título no cambia la conversación activa
+        db.query(Conversation).filter(
+            Conversation.conversation_id == conversation_id
+        ).update(
+            {Conversation.title: title, Conversation.updated_at: Conversation.updated_at},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+@job_queue.handler(GENERATE_CONVERSATION_TITLE)
+async def generate_conversation_title(conversation_id: int) -> None:
+    """Reemplazar el título por defecto (fecha/hora) por uno generado con GPT"""
+    text = await asyncio.to_thread(_load_conversation_text, conversation_id)
+    if not text:
+        return
+    title = await get_openai_service().generate_title(text, priority=PRIORITY_BATCH)
+    if title:
+        await asyncio.to_thread(_save_title, conversation_id, title)
+        logger.info("Título generado para conversación %s: %s", conversation_id, title)
+
+
+def _schedule_title(conversation_id: int, user_id: int) -> None:
+    job_queue.enqueue(GENERATE_CONVERSATION_TITLE, user_id=user_id, conversation_id=conversation_id)
+
+
+if settings.generate_conversation_titles:
+    turn_persistence_service.on_conversation_created.append(_schedule_title)
@@ -0,0 +1,152 @@
+"""
+Batch processing service
+Runs many transcription / TTS items through a bounded worker pool and
+streams each result as soon as it completes
+"""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from app.config import settings
+import asyncio
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJob:
+    """Progress of a batch job"""
+
+    def __init__(self, kind: str, user_id: int, total: int):
+        """
+        Initialize job
+
+        Args:
+            kind: Job kind (transcribe, tts)
+            user_id: Owner user id
+            total: Number of items
+        """
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.user_id = user_id
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.status = "queued"
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize job progress"""
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class BatchService:
+    """Bounded worker pool and registry of recent batch jobs"""
+
+    def __init__(self, max_workers: int, max_jobs: int = 1000):
+        """
+        Initialize service
+
+        Args:
+            max_workers: Concurrent items per job
+            max_jobs: Finished jobs kept for progress queries
+        """
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+
+    def create_job(self, kind: str, user_id: int, total: int) -> BatchJob:
+        """Register a new job"""
+        job = BatchJob(kind, user_id, total)
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[BatchJob]:
+        """Get a job by id"""
+        return self.jobs.get(job_id)
+
+    async def run(
+        self,
+        job: BatchJob,
+        items: List[Any],
+        worker: Callable[[Any], Awaitable[Dict[str, Any]]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process items with at most `max_workers` in flight
+
+        Args:
+            job: Job tracking progress
+            items: Items to process
+            worker: Coroutine processing one item and returning its result
+
+        Yields:
+            One result per item, in completion order, with the item index
+            and current job progress
+        """
+        pending: asyncio.Queue = asyncio.Queue()
+        for index, item in enumerate(items):
+            pending.put_nowait((index, item))
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def run_worker():
+            while True:
+                try:
+                    index, item = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await worker(item)
+                    result["status"] = "ok"
+                    job.completed += 1
+                except Exception as e:
+                    logger.error("Batch %s item %s failed: %s", job.job_id, index, e)
+                    result = {"status": "error", "error": str(e)}
+                    job.failed += 1
+                result["index"] = index
+                await results.put(result)
+
+        job.status = "running"
+        workers = [
+            asyncio.create_task(run_worker())
+            for _ in range(min(self.max_workers, len(items)))
+        ]
+        try:
+            for _ in range(len(items)):
+                result = await results.get()
+                result["progress"] = {
+                    "completed": job.completed,
+                    "failed": job.failed,
+                    "total": job.total,
+                }
+                yield result
+            job.status = "finished"
+        except BaseException:
+            job.status = "cancelled"
+            raise
+        finally:
+            for task in workers:
+                task.cancel()
+            job.finished_at = datetime.now()
+            logger.info(
+                "Batch %s (%s) %s: %s ok, %s failed of %s",
+                job.job_id, job.kind, job.status, job.completed, job.failed, job.total
+            )
+
+
+# Global service instance
+batch_service = BatchService(
+    max_workers=settings.batch_max_workers,
+    max_jobs=settings.batch_max_jobs
+)
@@ -0,0 +1,119 @@
+"""
+Active conversation resolution
+Caches the conversation each user is currently appending messages to
+
+The cache is shared by the event loop and the threads persisting turns in
+the background, so every access goes through a lock.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import Conversation
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ActiveConversationResolver:
+    """Per-user cache of the active conversation id"""
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Initialize resolver
+
+        Args:
+            max_entries: Maximum number of users kept in the cache (LRU)
+        """
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[int, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_cached(self, user_id: int) -> Optional[int]:
+        """
+        Get cached active conversation id for a user
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            Conversation id or None on cache miss
+        """
+        with self._lock:
+            conversation_id = self._cache.get(user_id)
+            if conversation_id is not None:
+                self._cache.move_to_end(user_id)
+            return conversation_id
+
+    def remember(self, user_id: int, conversation_id: int) -> None:
+        """
+        Store the active conversation for a user (only once it is committed)
+
+        Args:
+            user_id: User identifier
+            conversation_id: Conversation identifier
+        """
+        with self._lock:
+            self._cache[user_id] = conversation_id
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Drop the cached active conversation for a user
+
+        Args:
+            user_id: User identifier
+        """
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def resolve(self, db: Session, user_id: int) -> Tuple[int, bool]:
+        """
+        Resolve the conversation where the next turn must be appended
+
+        On a cache hit no query is issued. On a miss the most recent
+        conversation is loaded, or a new one is inserted in the caller's
+        transaction (flush only, the caller commits together with the turn).
+        The result is not cached here: the caller calls `remember` after the
+        commit, so a rolled-back conversation id never reaches the cache.
+
+        Args:
+            db: Database session
+            user_id: User identifier
+
+        Returns:
+            Tuple of (conversation id, whether it was created now)
+        """
+        conversation_id = self.get_cached(user_id)
+        if conversation_id is not None:
+            return conversation_id, False
+
+        conversation_id = db.query(Conversation.conversation_id).filter(
+            Conversation.user_id == user_id
+        ).order_by(Conversation.updated_at.desc()).limit(1).scalar()
+
+        created = conversation_id is None
+        if created:
+            now = datetime.now()
+            conversation = Conversation(
+                user_id=user_id,
+                title=f"Conversación {now.strftime('%d/%m %H:%M')}",
+                created_at=now,
+                updated_at=now
+            )
+            db.add(conversation)
+            db.flush()
+            conversation_id = conversation.conversation_id
+            logger.info("Nueva conversación: %s", conversation_id)
+
+        return conversation_id, created
+
+
+# Global resolver instance
+active_conversation_resolver = ActiveConversationResolver(
+    max_entries=settings.active_conversation_cache_size
+)
@@ -44,7 +44,7 @@ class ConversationService:
         )
         
         self.conversations[conversation_id].append(message)
-        logger.info(f"Added {role} message to conversation {conversation_id}")
+        logger.info("Added %s message to conversation %s", role, conversation_id)
         
         return self.conversations[conversation_id]
     
@@ -69,7 +69,7 @@ class ConversationService:
         """
         if conversation_id in self.conversations:
             del self.conversations[conversation_id]
-            logger.info(f"Cleared conversation {conversation_id}")
+            logger.info("Cleared conversation %s", conversation_id)
     
     def get_messages_for_api(
         self,
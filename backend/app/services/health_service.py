@@ -0,0 +1,167 @@
+"""
+Health and readiness service
+Keeps cached, periodically refreshed dependency checks for the readiness probe
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from app.config import settings
+from app.database import get_engine, warm_up_pool
+from app.services.openai_service import get_openai_service
+from app.services.prompt_service import prompt_service
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyCheck:
+    """Result of the last check of one dependency"""
+
+    def __init__(self, name: str):
+        """
+        Initialize check
+
+        Args:
+            name: Dependency name
+        """
+        self.name = name
+        self.healthy = False
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize check result"""
+        return {
+            "healthy": self.healthy,
+            "error": self.error,
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+        }
+
+
+class HealthService:
+    """Cached readiness state refreshed in the background"""
+
+    def __init__(self, interval_seconds: float, timeout_seconds: float, check_openai: bool = True):
+        """
+        Initialize health service
+
+        Args:
+            interval_seconds: Seconds between background refreshes
+            timeout_seconds: Timeout for each dependency check
+            check_openai: Whether the OpenAI API is part of readiness
+        """
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.check_openai = check_openai
+        self.warmed_up = False
+        self.checks: Dict[str, DependencyCheck] = {"database": DependencyCheck("database")}
+        if check_openai:
+            self.checks["openai"] = DependencyCheck("openai")
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """Pod is ready once warmed up and all dependencies were healthy on the last check"""
+        return self.warmed_up and all(check.healthy for check in self.checks.values())
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get cached check results"""
+        return {name: check.to_dict() for name, check in self.checks.items()}
+
+    @staticmethod
+    def _check_database() -> None:
+        """Run a trivial query on a pooled connection"""
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    @staticmethod
+    async def _check_openai() -> None:
+        """Retrieve the configured chat model (cheap authenticated call)"""
+        await get_openai_service().client.models.retrieve(settings.gpt_model)
+
+    async def _run_check(self, check: DependencyCheck, func) -> None:
+        """Run a check (blocking ones in a worker thread) and store its result"""
+        start = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(func):
+                pending = func()
+            else:
+                pending = asyncio.to_thread(func)
+            await asyncio.wait_for(pending, timeout=self.timeout_seconds)
+            check.healthy = True
+            check.error = None
+        except Exception as e:
+            if check.healthy:
+                logger.warning("Dependency %s became unhealthy: %s", check.name, e)
+            check.healthy = False
+            check.error = str(e) or e.__class__.__name__
+        check.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        check.checked_at = datetime.now()
+
+    async def refresh(self) -> None:
+        """Refresh all dependency checks concurrently"""
+        jobs = [self._run_check(self.checks["database"], self._check_database)]
+        if self.check_openai:
+            jobs.append(self._run_check(self.checks["openai"], self._check_openai))
+        await asyncio.gather(*jobs)
+
+    async def warm_up(self) -> None:
+        """
+        Prime connection pools and clients, then run the first checks
+
+        The pod only reports ready after this completes.
+        """
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(warm_up_pool)
+        except Exception as e:
+            logger.error("❌ Database warm-up failed: %s", e)
+        try:
+            await asyncio.to_thread(get_openai_service)
+        except Exception as e:
+            logger.error("❌ OpenAI client initialization failed: %s", e)
+        try:
+            await asyncio.to_thread(prompt_service.get)
+        except Exception as e:
+            logger.error("❌ Persona prompt loading failed: %s", e)
+
+        await self.refresh()
+        self.warmed_up = True
+        logger.info(
+            "Warm-up finished in %.0f ms, ready=%s",
+            (time.perf_counter() - start) * 1000, self.ready
+        )
+
+    async def _run(self) -> None:
+        """Warm up and keep refreshing checks until cancelled"""
+        await self.warm_up()
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.refresh()
+
+    def start(self) -> None:
+        """Start background warm-up and refresh loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop background refresh loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global service instance
+health_service = HealthService(
+    interval_seconds=settings.readiness_check_interval_seconds,
+    timeout_seconds=settings.readiness_check_timeout_seconds,
+    check_openai=settings.readiness_check_openai
+)
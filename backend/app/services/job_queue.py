@@ -0,0 +1,427 @@
+"""
+Background job queue
+Runs non-interactive work (conversation titles, summaries, bulk jobs) off
+the voice-turn critical path, with bounded concurrency, retries and status
+
+Modes (settings.job_queue_mode):
+- "inline": in-process asyncio workers started by the FastAPI lifespan
+- "external": jobs are stored in the `background_jobs` table and executed
+  by a separate worker process (`python -m app.worker`); a running job
+  holds a lease renewed through `updated_at`, so jobs of a crashed worker
+  are claimed again once it expires
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import and_, or_
+from app.config import settings
+from app.database import SessionLocal, BackgroundJob, get_engine
+import asyncio
+import json
+import logging
+import random
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[..., Awaitable[Any]]
+
+
+class Job:
+    """In-process job and its status"""
+
+    def __init__(self, name: str, payload: Dict[str, Any], max_attempts: int, user_id: Optional[int] = None):
+        """
+        Initialize job
+
+        Args:
+            name: Registered handler name
+            payload: Keyword arguments for the handler
+            max_attempts: Attempts before the job is marked as failed
+            user_id: User the job belongs to (None for system jobs)
+        """
+        self.job_id = uuid.uuid4().hex
+        self.name = name
+        self.payload = payload
+        self.user_id = user_id
+        self.max_attempts = max_attempts
+        self.attempts = 0
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize job status"""
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "user_id": self.user_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+def retry_delay(attempts: int) -> float:
+    """Jittered exponential backoff between job attempts"""
+    cap = min(settings.job_retry_max_delay_seconds, settings.job_retry_base_delay_seconds * (2 ** (attempts - 1)))
+    return random.uniform(cap / 2, cap)
+
+
+class JobQueue:
+    """Job queue with pluggable in-process or database-backed execution"""
+
+    def __init__(self, mode: str, concurrency: int, max_tracked_jobs: int = 10000):
+        """
+        Initialize queue
+
+        Args:
+            mode: "inline" or "external"
+            concurrency: Jobs executed concurrently by this process
+            max_tracked_jobs: Finished in-process jobs kept for status queries
+        """
+        self.mode = mode
+        self.concurrency = concurrency
+        self.max_tracked_jobs = max_tracked_jobs
+        self.handlers: Dict[str, JobHandler] = {}
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.counters = {"enqueued": 0, "succeeded": 0, "failed": 0, "retried": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        self._pending_before_start: List[Job] = []
+        # Reintentos esperando su backoff (fuera de la cola hasta que vence)
+        self._retries: Dict[str, Tuple[asyncio.TimerHandle, Job]] = {}
+
+    def handler(self, name: str):
+        """
+        Register an async job handler
+
+        Usage:
+            @job_queue.handler("generate_conversation_title")
+            async def generate_conversation_title(conversation_id: int): ...
+        """
+        def decorator(func: JobHandler) -> JobHandler:
+            self.handlers[name] = func
+            return func
+        return decorator
+
+    # --- Enqueue -----------------------------------------------------------
+
+    def enqueue(
+        self,
+        name: str,
+        max_attempts: Optional[int] = None,
+        user_id: Optional[int] = None,
+        **payload
+    ) -> str:
+        """
+        Enqueue a job (safe to call from the event loop or a worker thread)
+
+        Args:
+            name: Registered handler name
+            max_attempts: Attempts before failing (defaults to settings)
+            user_id: User the job belongs to, who may query its status
+            **payload: JSON-serializable handler arguments
+
+        Returns:
+            Job id
+        """
+        if name not in self.handlers:
+            raise ValueError(f"Unknown job: {name}")
+        max_attempts = max_attempts or settings.job_max_attempts
+        self.counters["enqueued"] += 1
+
+        if self.mode == "external":
+            return self._enqueue_db(name, payload, max_attempts, user_id)
+
+        job = Job(name, payload, max_attempts, user_id)
+        self._track(job)
+        self._put(job)
+        return job.job_id
+
+    def _put(self, job: Job) -> None:
+        if self._queue is None:
+            # Sin workers (p. ej. scripts): se ejecutará al arrancar la cola
+            self._pending_before_start.append(job)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._queue.put_nowait(job)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+
+    def _track(self, job: Job) -> None:
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > self.max_tracked_jobs:
+            self.jobs.popitem(last=False)
+
+    @staticmethod
+    def _enqueue_db(name: str, payload: Dict[str, Any], max_attempts: int, user_id: Optional[int]) -> str:
+        get_engine()
+        db = SessionLocal()
+        try:
+            row = BackgroundJob(
+                job_id=uuid.uuid4().hex,
+                name=name,
+                payload=json.dumps(payload),
+                user_id=user_id,
+                status="queued",
+                max_attempts=max_attempts,
+                run_after=datetime.now()
+            )
+            db.add(row)
+            db.commit()
+            return row.job_id
+        finally:
+            db.close()
+
+    # --- Status ------------------------------------------------------------
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the status of a job"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.mode != "external":
+            return None
+        get_engine()
+        db = SessionLocal()
+        try:
+            row = db.query(BackgroundJob).filter(BackgroundJob.job_id == job_id).first()
+            if row is None:
+                return None
+            return {
+                "job_id": row.job_id,
+                "name": row.name,
+                "user_id": row.user_id,
+                "status": row.status,
+                "attempts": row.attempts,
+                "max_attempts": row.max_attempts,
+                "error": row.error,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+            }
+        finally:
+            db.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get queue metrics"""
+        return {
+            "mode": self.mode,
+            "concurrency": self.concurrency,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "retry_scheduled": len(self._retries),
+            "running": sum(1 for job in self.jobs.values() if job.status == "running"),
+            **self.counters,
+        }
+
+    # --- In-process workers ------------------------------------------------
+
+    async def _execute(self, job: Job) -> None:
+        job.attempts += 1
+        job.status = "running"
+        job.updated_at = datetime.now()
+        try:
+            await self.handlers[job.name](**job.payload)
+            job.status = "succeeded"
+            job.error = None
+            self.counters["succeeded"] += 1
+        except Exception as e:
+            job.error = str(e)
+            if job.attempts < job.max_attempts:
+                job.status = "queued"
+                self.counters["retried"] += 1
+                delay = retry_delay(job.attempts)
+                logger.warning("Job %s %s failed (%s), retrying in %.1fs", job.name, job.job_id, e, delay)
+                self._retries[job.job_id] = (self._loop.call_later(delay, self._requeue, job), job)
+            else:
+                job.status = "failed"
+                self.counters["failed"] += 1
+                logger.error("Job %s %s failed after %s attempts: %s", job.name, job.job_id, job.attempts, e)
+        job.updated_at = datetime.now()
+
+    def _requeue(self, job: Job) -> None:
+        self._retries.pop(job.job_id, None)
+        self._queue.put_nowait(job)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        """Start in-process workers (no-op in external mode)"""
+        if self.mode == "external" or self._workers:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        for job in self._pending_before_start:
+            self._queue.put_nowait(job)
+        self._pending_before_start = []
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info("Job queue started with %s workers", self.concurrency)
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """
+        Let queued jobs finish for up to `timeout` seconds, then stop workers
+
+        Retries still waiting for their backoff are run right away instead,
+        since their timers would not survive the process.
+        """
+        if not self._workers:
+            return
+        deadline = self._loop.time() + timeout
+        while True:
+            for handle, job in self._retries.values():
+                handle.cancel()
+                self._queue.put_nowait(job)
+            self._retries.clear()
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=max(0.0, deadline - self._loop.time()))
+            except asyncio.TimeoutError:
+                break
+            if not self._retries:
+                break
+        for handle, _ in self._retries.values():
+            handle.cancel()
+        pending = self._queue.qsize() + len(self._retries)
+        self._retries.clear()
+        if pending:
+            logger.warning("Job queue stopped with %s jobs pending", pending)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # --- External worker ---------------------------------------------------
+
+    def _claim_db_job(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the next due job, or a running one whose lease
+        expired (FOR UPDATE SKIP LOCKED)
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.now()
+            row = db.query(BackgroundJob).filter(or_(
+                and_(BackgroundJob.status == "queued", BackgroundJob.run_after <= now),
+                and_(
+                    BackgroundJob.status == "running",
+                    BackgroundJob.updated_at < now - timedelta(seconds=settings.job_lease_seconds)
+                )
+            )).order_by(
+                BackgroundJob.run_after.asc()
+            ).with_for_update(skip_locked=True).first()
+            if row is None:
+                return None
+            if row.status == "running":
+                logger.warning("Job %s %s lease expired (worker lost), reclaiming", row.name, row.job_id)
+                if row.attempts >= row.max_attempts:
+                    row.status = "failed"
+                    row.error = "lease expired"
+                    row.updated_at = now
+                    self.counters["failed"] += 1
+                    db.commit()
+                    return None
+            row.status = "running"
+            row.attempts += 1
+            row.updated_at = datetime.now()
+            db.commit()
+            return {
+                "job_id": row.job_id,
+                "name": row.name,
+                "payload": json.loads(row.payload),
+                "attempts": row.attempts,
+                "max_attempts": row.max_attempts,
+            }
+        finally:
+            db.close()
+
+    @staticmethod
+    def _renew_db_lease(job_id: str) -> None:
+        db = SessionLocal()
+        try:
+            db.query(BackgroundJob).filter(
+                BackgroundJob.job_id == job_id,
+                BackgroundJob.status == "running"
+            ).update({BackgroundJob.updated_at: datetime.now()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _keep_lease(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(settings.job_lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self._renew_db_lease, job_id)
+            except Exception as e:
+                logger.warning("Job %s lease renewal failed: %s", job_id, e)
+
+    def _finish_db_job(self, claimed: Dict[str, Any], error: Optional[str]) -> None:
+        db = SessionLocal()
+        try:
+            row = db.query(BackgroundJob).filter(BackgroundJob.job_id == claimed["job_id"]).first()
+            row.error = error
+            row.updated_at = datetime.now()
+            if error is None:
+                row.status = "succeeded"
+                self.counters["succeeded"] += 1
+            elif claimed["attempts"] < claimed["max_attempts"]:
+                row.status = "queued"
+                row.run_after = datetime.now() + timedelta(seconds=retry_delay(claimed["attempts"]))
+                self.counters["retried"] += 1
+            else:
+                row.status = "failed"
+                self.counters["failed"] += 1
+            db.commit()
+        finally:
+            db.close()
+
+    async def run_external_worker(self, poll_interval: float = 1.0) -> None:
+        """Poll the jobs table and execute jobs with bounded concurrency"""
+        get_engine()
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+
+        async def run(claimed: Dict[str, Any]) -> None:
+            lease = asyncio.create_task(self._keep_lease(claimed["job_id"]))
+            try:
+                await self.handlers[claimed["name"]](**claimed["payload"])
+                error = None
+            except Exception as e:
+                logger.error("Job %s %s failed: %s", claimed["name"], claimed["job_id"], e)
+                error = str(e) or e.__class__.__name__
+            finally:
+                lease.cancel()
+                slots.release()
+            await asyncio.to_thread(self._finish_db_job, claimed, error)
+
+        logger.info("External job worker started with %s slots", self.concurrency)
+        while True:
+            await slots.acquire()
+            claimed = await asyncio.to_thread(self._claim_db_job)
+            if claimed is None:
+                slots.release()
+                await asyncio.sleep(poll_interval)
+                continue
+            task = asyncio.create_task(run(claimed))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+
+# Global queue instance
+job_queue = JobQueue(
+    mode=settings.job_queue_mode,
+    concurrency=settings.job_queue_concurrency
+)
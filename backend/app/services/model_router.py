@@ -0,0 +1,231 @@
+"""
+Model routing service
+Picks model, voice and max_tokens per persona and request class, pins the
+decision per conversation and keeps latency/cost metrics per route
+
+Routes are declared in the persona file (`app/personas/<persona>.json`):
+
+    "routes": {
+        "small_talk": {"max_tokens": 80},
+        "complex": {"model": "gpt-4o", "max_tokens": 200, "voice": "nova"}
+    }
+
+Missing fields fall back to the persona defaults and Settings: small talk
+uses GPT_MODEL and complex questions GPT_COMPLEX_MODEL.
+
+A conversation keeps the route it was given, so the model does not flip
+between turns; it only escalates from small talk to complex.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.config import settings
+from app.services.prompt_service import prompt_service, PersonaPrompt
+from app.services.upstream_scheduler import upstream_scheduler
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+REQUEST_CLASS_SMALL_TALK = "small_talk"
+REQUEST_CLASS_COMPLEX = "complex"
+
+# Señales de preguntas que necesitan un modelo más capaz
+_COMPLEX_MARKERS = re.compile(
+    r"\b(por qué|porque|explica|explícame|cómo funciona|compara|diferencia|analiza|"
+    r"calcula|paso a paso|ventajas|desventajas|resume|recomienda|why|explain|compare)\b",
+    re.IGNORECASE
+)
+
+
+def classify_request(message: str) -> str:
+    """
+    Classify a user message as small talk or a complex question
+
+    Args:
+        message: User message
+
+    Returns:
+        Request class
+    """
+    words = len(message.split())
+    if words > settings.small_talk_max_words or _COMPLEX_MARKERS.search(message):
+        return REQUEST_CLASS_COMPLEX
+    return REQUEST_CLASS_SMALL_TALK
+
+
+class RouteStats:
+    """Latency and cost accumulated for one route"""
+
+    def __init__(self):
+        """Initialize counters"""
+        self.requests = 0
+        self.total_latency_ms = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get counters"""
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "avg_latency_ms": round(self.total_latency_ms / requests, 2),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+class Route:
+    """Resolved generation parameters for a persona and request class"""
+
+    def __init__(
+        self,
+        persona: PersonaPrompt,
+        request_class: str,
+        model: str,
+        max_tokens: int,
+        voice: str,
+        prices: Optional[Dict[str, float]] = None
+    ):
+        """
+        Initialize route
+
+        Args:
+            persona: Persona prompt
+            request_class: Request class the route serves
+            model: Chat model
+            max_tokens: Maximum completion tokens
+            voice: TTS voice
+            prices: USD per million input/output tokens of the model (optional)
+        """
+        self.persona = persona
+        self.request_class = request_class
+        self.model = model
+        self.max_tokens = max_tokens
+        self.voice = voice
+        self.prices = prices or {}
+        self.name = f"{persona.key}/{request_class}"
+        self.stats = RouteStats()
+
+    def record(self, latency_ms: float, usage=None) -> None:
+        """
+        Record one completion served by this route
+
+        Args:
+            latency_ms: Completion latency
+            usage: Completion usage (optional)
+        """
+        self.stats.requests += 1
+        self.stats.total_latency_ms += latency_ms
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_tokens or 0
+        completion_tokens = usage.completion_tokens or 0
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.completion_tokens += completion_tokens
+        self.stats.cost_usd += (
+            prompt_tokens * self.prices.get("input", 0) + completion_tokens * self.prices.get("output", 0)
+        ) / 1_000_000
+
+
+class ModelRouter:
+    """Route requests to models per persona and request class"""
+
+    def __init__(self, max_pinned_conversations: int = 10000):
+        """
+        Initialize router
+
+        Args:
+            max_pinned_conversations: Conversations whose route is remembered (LRU)
+        """
+        self.max_pinned_conversations = max_pinned_conversations
+        self.prices: Dict[str, Dict[str, float]] = json.loads(settings.model_prices_per_million)
+        self._routes: Dict[Tuple[str, str], Route] = {}
+        self._pinned: "OrderedDict[int, Route]" = OrderedDict()
+
+    def _build_route(self, persona: PersonaPrompt, request_class: str) -> Route:
+        config = persona.extra.get("routes", {}).get(request_class, {})
+        default_model = settings.gpt_model
+        if request_class == REQUEST_CLASS_COMPLEX and settings.gpt_complex_model:
+            default_model = settings.gpt_complex_model
+        model = config.get("model") or default_model
+        if model not in upstream_scheduler.limiters:
+            # Los modelos de chat de las rutas comparten los límites de GPT
+            upstream_scheduler.configure(
+                model,
+                settings.gpt_max_concurrency,
+                settings.gpt_requests_per_minute,
+                settings.gpt_tokens_per_minute
+            )
+        return Route(
+            persona=persona,
+            request_class=request_class,
+            model=model,
+            max_tokens=config.get("max_tokens") or persona.max_tokens,
+            voice=config.get("voice") or persona.extra.get("voice") or settings.tts_voice,
+            prices=self.prices.get(model)
+        )
+
+    def get_route(self, persona_key: Optional[str], request_class: str) -> Route:
+        """Get (building once) the route for a persona and request class"""
+        persona = prompt_service.get(persona_key)
+        key = (persona.key, request_class)
+        route = self._routes.get(key)
+        if route is None:
+            route = self._build_route(persona, request_class)
+            self._routes[key] = route
+            logger.info(
+                "Route %s: model=%s max_tokens=%s voice=%s",
+                route.name, route.model, route.max_tokens, route.voice
+            )
+        return route
+
+    def route(
+        self,
+        message: str,
+        persona_key: Optional[str] = None,
+        conversation_id: Optional[int] = None
+    ) -> Route:
+        """
+        Pick the route for a message
+
+        Args:
+            message: User message
+            persona_key: Persona (tenant) requested (defaults to settings.persona)
+            conversation_id: Conversation the route is pinned to (optional)
+
+        Returns:
+            Route to use
+        """
+        route = self.get_route(persona_key, classify_request(message))
+        if conversation_id is None:
+            return route
+
+        pinned = self._pinned.get(conversation_id)
+        if (
+            pinned is not None
+            and pinned.persona.key == route.persona.key
+            and (pinned.request_class == REQUEST_CLASS_COMPLEX or route.request_class == REQUEST_CLASS_SMALL_TALK)
+        ):
+            self._pinned.move_to_end(conversation_id)
+            return pinned
+
+        # Primera decisión de la conversación, escalado a complex o cambio de persona
+        self._pinned[conversation_id] = route
+        self._pinned.move_to_end(conversation_id)
+        while len(self._pinned) > self.max_pinned_conversations:
+            self._pinned.popitem(last=False)
+        return route
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-route metrics"""
+        return {
+            route.name: {"model": route.model, **route.stats.snapshot()}
+            for route in self._routes.values()
+        }
+
+
+# Global router instance
+model_router = ModelRouter(max_pinned_conversations=settings.routing_cache_size)
@@ -2,10 +2,28 @@
 OpenAI API service wrapper
 Handles all interactions with OpenAI API
 """
-from openai import OpenAI
 from app.config import settings
-from typing import List, Dict
+from app.services.upstream_scheduler import (
+    upstream_scheduler,
+    estimate_tokens,
+    PRIORITY_INTERACTIVE
+)
+from app.services.prompt_service import prompt_service
+from app.services.model_router import Route
+from app.services.turn_persistence import TurnUsage
+from app.services.resilience import (
+    TurnDeadline,
+    call_with_retry,
+    run_hedged,
+    standalone_stage_timeout,
+    STAGE_STT,
+    STAGE_LLM,
+    STAGE_TTS
+)
+from typing import Callable, List, Dict, Optional
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -15,121 +33,226 @@ class OpenAIService:
     
     def __init__(self):
         """Initialize OpenAI client"""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        # Importación diferida: el SDK de OpenAI es costoso de importar
+        from openai import AsyncOpenAI
+        
+        # Los reintentos y timeouts los gestiona app.services.resilience
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
         self.whisper_model = settings.whisper_model
         self.gpt_model = settings.gpt_model
         self.tts_model = settings.tts_model
         self.tts_voice = settings.tts_voice
+        self.embedding_model = settings.embedding_model
+    
+    @staticmethod
+    def _stage_timeout(stage: str, deadline: Optional[TurnDeadline], timeout_seconds: Optional[float] = None) -> float:
+        """Budget for a stage: explicit timeout, else the turn deadline, else the standalone budget"""
+        if timeout_seconds is not None:
+            return timeout_seconds
+        if deadline is None:
+            return standalone_stage_timeout()
+        return deadline.stage_timeout(stage)
     
-    async def transcribe_audio(self, audio_file) -> str:
+    async def transcribe_audio(
+        self,
+        audio_file,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[TurnDeadline] = None,
+        usage: Optional[TurnUsage] = None,
+        timeout_seconds: Optional[float] = None
+    ) -> str:
         """
         Transcribe audio file to text using Whisper
         
         Args:
             audio_file: Audio file object (bytes or file-like)
+            priority: Upstream scheduling priority
+            deadline: Turn deadline used to derive the stage budget (optional)
+            usage: Turn usage receiving STT latency and audio duration (optional)
+            timeout_seconds: Stage budget overriding the deadline (e.g. batch work)
             
         Returns:
             Transcribed text
         """
         try:
             logger.info("Starting audio transcription")
+            # verbose_json incluye la duración del audio (solo modelos whisper)
+            verbose = usage is not None and self.whisper_model.startswith("whisper")
             
-            transcription = self.client.audio.transcriptions.create(
-                model=self.whisper_model,
-                file=audio_file,
-                response_format="text"
+            async def attempt():
+                if hasattr(audio_file, "seek"):
+                    audio_file.seek(0)
+                async with upstream_scheduler.slot(self.whisper_model, priority):
+                    return await self.client.audio.transcriptions.create(
+                        model=self.whisper_model,
+                        file=audio_file,
+                        response_format="verbose_json" if verbose else "text"
+                    )
+            
+            started = time.perf_counter()
+            transcription = await call_with_retry(
+                STAGE_STT,
+                attempt,
+                self._stage_timeout(STAGE_STT, deadline, timeout_seconds)
             )
+            if usage is not None:
+                usage.stt_ms = (time.perf_counter() - started) * 1000
+                if verbose:
+                    usage.audio_duration = transcription.duration
+                    transcription = transcription.text
             
-            logger.info(f"Transcription successful: {transcription[:50]}...")
+            logger.debug("Transcription successful: %.50s...", transcription)
             return transcription
             
         except Exception as e:
-            logger.error(f"Transcription error: {str(e)}")
+            logger.error("Transcription error: %s", e)
             raise
     
     async def get_chat_completion_stream(
         self,
         message: str,
-        conversation_history: List[Dict[str, str]] = None
+        conversation_history: List[Dict[str, str]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[TurnDeadline] = None,
+        persona: Optional[str] = None,
+        route: Optional[Route] = None,
+        usage: Optional[TurnUsage] = None
     ):
         """
         Get streaming chat completion from GPT
+        
+        The persona system prompt is precompiled once and always sent as the
+        first message, so the upstream prompt cache can reuse it. When a
+        route is given (see app.services.model_router) its persona, model
+        and max_tokens are used and the completion is recorded on it. When
+        a turn usage is given it receives the latency and token counts.
         """
         try:
             logger.info("Getting streaming chat completion")
             
-            messages = []
-            messages.append({
-                "role": "system",
-                "content": """Eres Kati, una asistente virtual con acento colombiano, muy natural y conversacional.
-
-                PERSONALIDAD Y ESTILO:
-                - Hablas como una colombiana real, cálida y amigable
-                - Usas expresiones colombianas naturales: "¡Uy sí!", "Claro que sí", "Con mucho gusto", "¡Listo!"
-                - Tu tono es cercano, como hablar con una amiga
-                - Eres profesional pero no formal en exceso
-                - Respondes de forma concisa y directa (máximo 3-4 oraciones)
-
-                EXPRESIONES COLOMBIANAS QUE USAS:
-                - "¿Cómo estás?" en lugar de "¿Cómo te va?"
-                - "Con gusto" o "Con mucho gusto"
-                - "¡Uy!" para expresar sorpresa
-                - "Bacano" o "Chévere" para cosas positivas
-                - "¿Me entiendes?" o "¿Cierto?" al final de explicaciones
-
-                EVITA:
-                - Expresiones de España (vale, tío, guay)
-                - Expresiones mexicanas (órale, wey, chido)
-                - Expresiones argentinas (che, boludo)
-                - Lenguaje demasiado formal o robótico
-                - Respuestas muy largas
-
-                EJEMPLOS:
-                Usuario: "¿Cómo estás?"
-                Tú: "¡Uy, muy bien! ¿Y tú qué más? ¿En qué te puedo ayudar hoy?"
-
-                Usuario: "¿Qué tiempo hace?"
-                Tú: "Claro, con gusto te ayudo. ¿De qué ciudad me preguntas? Dime la ciudad y te digo el clima."
-
-                RECUERDA: Eres natural, conversacional y colombiana. No suenas como robot ni como española.
-                """
-            })
-            
-            if conversation_history:
-                messages.extend(conversation_history)
-            
-            messages.append({
-                "role": "user",
-                "content": message
-            })
-            
-            stream = self.client.chat.completions.create(
-                model=self.gpt_model,
-                messages=messages,
-                temperature=0.8,
-                max_tokens=150,
-                stream=True
-            )
+            prompt = route.persona if route else prompt_service.get(persona)
+            model = route.model if route else self.gpt_model
+            max_tokens = route.max_tokens if route else prompt.max_tokens
+            messages = prompt.build_messages(message, conversation_history)
+            tokens = prompt.estimate_request_tokens(messages) - prompt.max_tokens + max_tokens
+            completion_usage = []
+            
+            async def attempt():
+                full_response = ""
+                async with upstream_scheduler.slot(model, priority, tokens=tokens):
+                    stream = await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=prompt.temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                    
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            full_response += chunk.choices[0].delta.content
+                        if chunk.usage:
+                            prompt_service.cache_stats.record(chunk.usage)
+                            completion_usage.append(chunk.usage)
+                return full_response
             
-            full_response = ""
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    full_response += chunk.choices[0].delta.content
+            started = time.perf_counter()
+            full_response = await call_with_retry(
+                STAGE_LLM,
+                attempt,
+                self._stage_timeout(STAGE_LLM, deadline)
+            )
+            latency_ms = (time.perf_counter() - started) * 1000
+            if route:
+                route.record(latency_ms, completion_usage[-1] if completion_usage else None)
+            if usage is not None:
+                usage.record_completion(model, latency_ms, completion_usage[-1] if completion_usage else None)
             
-            logger.info(f"Streaming chat completion successful")
+            logger.info("Streaming chat completion successful (%s)", model)
             return full_response
             
         except Exception as e:
-            logger.error(f"Streaming chat completion error: {str(e)}")
+            logger.error("Streaming chat completion error: %s", e)
             raise
     
-    async def text_to_speech(self, text: str, voice: str = None) -> bytes:
+    async def generate_title(self, conversation_text: str, priority: int = PRIORITY_INTERACTIVE) -> str:
+        """
+        Generate a short conversation title with GPT
+        
+        Args:
+            conversation_text: First messages of the conversation
+            priority: Upstream scheduling priority
+            
+        Returns:
+            Title (at most 60 characters)
+        """
+        messages = [
+            {
+                "role": "system",
+                "content": "Resume la conversación en un título corto en español "
+                           "(máximo 6 palabras, sin comillas ni punto final)."
+            },
+            {"role": "user", "content": conversation_text},
+        ]
+        max_tokens = 20
+        tokens = sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+        
+        async def attempt():
+            async with upstream_scheduler.slot(self.gpt_model, priority, tokens=tokens):
+                completion = await self.client.chat.completions.create(
+                    model=self.gpt_model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=max_tokens
+                )
+            return completion.choices[0].message.content or ""
+        
+        title = await call_with_retry(STAGE_LLM, attempt, standalone_stage_timeout())
+        return title.strip().strip('"').strip()[:60]
+    
+    async def embed_text(self, text: str, priority: int = PRIORITY_INTERACTIVE) -> List[float]:
+        """
+        Embed a text (single attempt, callers bound it with their own timeout)
+        
+        Args:
+            text: Text to embed
+            priority: Upstream scheduling priority
+            
+        Returns:
+            Embedding vector with settings.embedding_dimensions values
+        """
+        async with upstream_scheduler.slot(self.embedding_model, priority, tokens=estimate_tokens(text)):
+            result = await self.client.embeddings.create(
+                model=self.embedding_model,
+                input=text,
+                dimensions=settings.embedding_dimensions
+            )
+        return result.data[0].embedding
+    
+    async def text_to_speech(
+        self,
+        text: str,
+        voice: str = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[TurnDeadline] = None,
+        on_chunk: Optional[Callable[[bytes], None]] = None,
+        timeout_seconds: Optional[float] = None
+    ) -> bytes:
         """
         Convert text to speech using OpenAI TTS
         
+        If TTS_HEDGE_DELAY_MS is set, a second request is fired when the
+        first one has not produced a byte within that delay.
+        
         Args:
             text: Text to convert
             voice: Voice option (optional, uses default from settings)
+            priority: Upstream scheduling priority
+            deadline: Turn deadline used to derive the stage budget (optional)
+            on_chunk: Called with each audio chunk as it arrives (optional).
+                Once a chunk has been forwarded the call is no longer retried.
+            timeout_seconds: Stage budget overriding the deadline (e.g. batch work)
             
         Returns:
             Audio bytes
@@ -138,25 +261,74 @@ class OpenAIService:
             logger.info("Converting text to speech")
             
             selected_voice = voice or self.tts_voice
+            forwarded = []
             
-            response = self.client.audio.speech.create(
-                model=self.tts_model,
-                voice=selected_voice,
-                input=text,
-                response_format="mp3"
-            )
+            async def request_audio(claim):
+                chunks = []
+                async with upstream_scheduler.slot(self.tts_model, priority):
+                    async with self.client.audio.speech.with_streaming_response.create(
+                        model=self.tts_model,
+                        voice=selected_voice,
+                        input=text,
+                        response_format="mp3"
+                    ) as response:
+                        async for chunk in response.iter_bytes():
+                            if not chunks and not claim():
+                                return None
+                            chunks.append(chunk)
+                            if on_chunk:
+                                forwarded.append(len(chunk))
+                                on_chunk(chunk)
+                return b"".join(chunks)
             
-            audio_bytes = b""
-            for chunk in response.iter_bytes():
-                audio_bytes += chunk
+            async def attempt():
+                try:
+                    if settings.tts_hedge_delay_ms > 0:
+                        return await run_hedged(request_audio, settings.tts_hedge_delay_ms / 1000)
+                    return await request_audio(lambda: True)
+                except Exception as e:
+                    if forwarded:
+                        # Ya se enviaron bytes al consumidor: no se puede reintentar
+                        raise RuntimeError(f"TTS stream interrupted: {str(e)}") from e
+                    raise
             
-            logger.info(f"TTS conversion successful, audio size: {len(audio_bytes)} bytes")
+            # Un timeout de call_with_retry no pasa por el except de attempt():
+            # tras el primer fragmento reenviado ningún fallo se reintenta
+            audio_bytes = await call_with_retry(
+                STAGE_TTS,
+                attempt,
+                self._stage_timeout(STAGE_TTS, deadline, timeout_seconds),
+                can_retry=lambda: not forwarded
+            )
+            
+            logger.info("TTS conversion successful, audio size: %s bytes", len(audio_bytes))
             return audio_bytes
             
         except Exception as e:
-            logger.error(f"TTS error: {str(e)}")
+            logger.error("TTS error: %s", e)
             raise
 
 
-# Global service instance
-openai_service = OpenAIService()
\ No newline at end of file
+_openai_service: Optional[OpenAIService] = None
+_openai_service_lock = threading.Lock()
+
+
+def get_openai_service() -> OpenAIService:
+    """
+    Dependency que devuelve la instancia compartida de OpenAIService,
+    creada en el primer uso
+    """
+    global _openai_service
+    if _openai_service is None:
+        with _openai_service_lock:
+            if _openai_service is None:
+                _openai_service = OpenAIService()
+    return _openai_service
+
+
+async def close_openai_service() -> None:
+    """Cerrar el pool HTTP del cliente compartido (apagado ordenado)"""
+    global _openai_service
+    service, _openai_service = _openai_service, None
+    if service is not None:
+        await service.client.close()
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+Live profiling service
+Event-loop lag monitor, slow-callback capture and a stack-sampling profiler
+that can be switched on for a time window without restarting the worker
+
+Everything here is stdlib: the sampler reads `sys._current_frames()` from
+a daemon thread, and slow callbacks come from asyncio debug mode, which is
+only enabled while a profiling window is open.
+"""
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.config import settings
+import asyncio
+import heapq
+import logging
+import re
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+# Marcos en los que el hilo está esperando, no trabajando
+_IDLE_FUNCTIONS = {"select", "poll", "epoll", "kqueue", "wait", "_worker", "get", "sleep"}
+_SLOW_CALLBACK = re.compile(r"^Executing (?P<handle>.+) took (?P<seconds>[\d.]+) seconds$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = "/".join(code.co_filename.split("/")[-2:])
+    return f"{filename}:{code.co_name}:{frame.f_lineno}"
+
+
+def _stack(frame, max_depth: int) -> tuple:
+    stack = []
+    while frame is not None and len(stack) < max_depth:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+class EventLoopMonitor:
+    """Measures how late a periodic timer fires on the event loop"""
+
+    def __init__(self, interval: float, window: int = 600):
+        """
+        Initialize monitor
+
+        Args:
+            interval: Seconds between probes
+            window: Recent samples kept
+        """
+        self.interval = interval
+        self.samples: deque = deque(maxlen=window)
+        self.max_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            self.samples.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms > settings.profiling_slow_callback_ms:
+                logger.warning("Event loop lag: %.0f ms", lag_ms)
+
+    def start(self) -> None:
+        """Start the monitor task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the monitor task"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Recent lag statistics"""
+        samples = sorted(self.samples)
+        if not samples:
+            return {"running": self._task is not None, "samples": 0}
+        return {
+            "running": self._task is not None,
+            "samples": len(samples),
+            "avg_ms": round(sum(samples) / len(samples), 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 2),
+            "max_recent_ms": round(samples[-1], 2),
+            "max_ms": round(self.max_lag_ms, 2),
+        }
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Collects asyncio debug-mode 'Executing <handle> took N seconds' warnings"""
+
+    def __init__(self, store: deque):
+        super().__init__(logging.WARNING)
+        self.store = store
+
+    def emit(self, record: logging.LogRecord) -> None:
+        match = _SLOW_CALLBACK.match(record.getMessage())
+        if match:
+            self.store.append({
+                "at": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                "callback": match.group("handle")[:300],
+                "ms": round(float(match.group("seconds")) * 1000, 1),
+            })
+
+
+class ProfilingSession:
+    """One profiling window and its results"""
+
+    def __init__(self, duration: float, interval: float, slow_callback_ms: float):
+        """
+        Initialize session
+
+        Args:
+            duration: Window length in seconds
+            interval: Seconds between stack samples
+            slow_callback_ms: Callbacks slower than this are reported
+        """
+        self.duration = duration
+        self.interval = interval
+        self.slow_callback_ms = slow_callback_ms
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.leaf_functions: Counter = Counter()
+        self.slow_callbacks: deque = deque(maxlen=200)
+        # Compartido con el hilo de muestreo, que actualiza los contadores
+        self.lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Whether the window is still open"""
+        return self.finished_at is None
+
+    def report(self, top: int) -> Dict[str, Any]:
+        """Top stacks and functions, as counts and share of samples"""
+        with self.lock:
+            samples = self.samples
+            finished_at = self.finished_at
+            stacks = dict(self.stacks)
+            leaf_functions = dict(self.leaf_functions)
+        total = samples or 1
+        return {
+            "running": finished_at is None,
+            "started_at": self.started_at,
+            "finished_at": finished_at,
+            "duration_seconds": self.duration,
+            "interval_ms": self.interval * 1000,
+            "samples": samples,
+            "top_functions": [
+                {"function": name, "samples": count, "share": round(count / total, 4)}
+                for name, count in heapq.nlargest(top, leaf_functions.items(), key=lambda item: item[1])
+            ],
+            "top_stacks": [
+                {"stack": " <- ".join(reversed(stack)), "samples": count, "share": round(count / total, 4)}
+                for stack, count in heapq.nlargest(top, stacks.items(), key=lambda item: item[1])
+            ],
+            "slow_callbacks": list(self.slow_callbacks),
+        }
+
+
+class Profiler:
+    """Admin-triggered profiling windows and on-demand stack dumps"""
+
+    def __init__(self, max_depth: int = 40):
+        """
+        Initialize profiler
+
+        Args:
+            max_depth: Frames kept per sampled stack
+        """
+        self.max_depth = max_depth
+        self.loop_monitor = EventLoopMonitor(settings.profiling_loop_probe_interval_seconds)
+        self.session: Optional[ProfilingSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start_monitor(self) -> None:
+        """Start the event-loop lag monitor (called from the lifespan)"""
+        self._loop = asyncio.get_running_loop()
+        self.loop_monitor.start()
+
+    async def stop_monitor(self) -> None:
+        """Stop the event-loop lag monitor"""
+        await self.loop_monitor.stop()
+
+    def start_session(self, duration: float, interval: float, slow_callback_ms: float) -> ProfilingSession:
+        """
+        Open a profiling window
+
+        Raises:
+            RuntimeError: If a window is already open
+        """
+        if self.session is not None and self.session.running:
+            raise RuntimeError("A profiling session is already running")
+        session = ProfilingSession(duration, interval, slow_callback_ms)
+        self.session = session
+
+        loop = self._loop or asyncio.get_running_loop()
+        handler = _SlowCallbackHandler(session.slow_callbacks)
+        asyncio_logger = logging.getLogger("asyncio")
+        previous_debug = loop.get_debug()
+        previous_threshold = loop.slow_callback_duration
+        loop.slow_callback_duration = slow_callback_ms / 1000
+        loop.set_debug(True)
+        asyncio_logger.addHandler(handler)
+
+        def finish() -> None:
+            loop.set_debug(previous_debug)
+            loop.slow_callback_duration = previous_threshold
+            asyncio_logger.removeHandler(handler)
+            logger.info("Profiling session finished: %s samples", session.samples)
+
+        thread = threading.Thread(
+            target=self._sample,
+            args=(session, loop, finish),
+            name="profiler-sampler",
+            daemon=True
+        )
+        thread.start()
+        logger.info("Profiling session started for %.0f s", duration)
+        return session
+
+    def _sample(self, session: ProfilingSession, loop: asyncio.AbstractEventLoop, finish) -> None:
+        own_thread = threading.get_ident()
+        deadline = time.monotonic() + session.duration
+        while time.monotonic() < deadline:
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = _stack(frame, self.max_depth)
+                if not stack or stack[-1].split(":")[1] in _IDLE_FUNCTIONS:
+                    continue
+                stacks.append(stack)
+            with session.lock:
+                for stack in stacks:
+                    session.stacks[stack] += 1
+                    session.leaf_functions[stack[-1]] += 1
+                session.samples += 1
+            time.sleep(session.interval)
+        with session.lock:
+            session.finished_at = datetime.now()
+        loop.call_soon_threadsafe(finish)
+
+    def dump_stacks(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Current stack of every thread and of every pending asyncio task"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        threads = [
+            {"thread": names.get(thread_id, str(thread_id)), "stack": traceback.format_stack(frame)[-self.max_depth:]}
+            for thread_id, frame in sys._current_frames().items()
+        ]
+        tasks = []
+        for task in asyncio.all_tasks(self._loop):
+            frames = task.get_stack(limit=self.max_depth)
+            tasks.append({
+                "task": task.get_name(),
+                "coroutine": getattr(task.get_coro(), "__qualname__", str(task.get_coro())),
+                "stack": [_frame_label(frame) for frame in frames],
+            })
+        return {"threads": threads, "tasks": tasks}
+
+
+# Global profiler instance
+profiler = Profiler()
@@ -0,0 +1,192 @@
+"""
+Persona prompt service
+Loads persona templates once, keeps the system message as a stable prefix
+and tracks how much of it the upstream prompt cache serves
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.services.upstream_scheduler import estimate_tokens
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERSONAS_DIR = Path(__file__).resolve().parent.parent / "personas"
+
+try:
+    import tiktoken
+except ImportError:  # Dependencia opcional: sin ella se usa una estimación
+    tiktoken = None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count tokens with tiktoken when available, otherwise estimate
+
+    Args:
+        text: Text to count
+        model: Model name used to pick the encoding
+
+    Returns:
+        Token count
+    """
+    if tiktoken is None:
+        return estimate_tokens(text)
+    try:
+        encoding = tiktoken.encoding_for_model(model or settings.gpt_model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return len(encoding.encode(text))
+
+
+class PersonaPrompt:
+    """Precompiled persona: system message, generation parameters and token cost"""
+
+    def __init__(
+        self,
+        key: str,
+        name: str,
+        system_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        extra: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize persona
+
+        Args:
+            key: Persona identifier (file stem)
+            name: Display name
+            system_prompt: System prompt text
+            temperature: Sampling temperature
+            max_tokens: Maximum completion tokens
+            extra: Any other fields from the persona file
+        """
+        self.key = key
+        self.name = name
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.extra = extra or {}
+        # Mismo dict en cada llamada: prefijo idéntico para el prompt cache
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.prompt_tokens = count_tokens(system_prompt)
+
+    def build_messages(
+        self,
+        message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Build the chat messages: stable system prefix, then variable history
+
+        Args:
+            message: User message
+            conversation_history: Previous messages (optional)
+
+        Returns:
+            Messages for the chat completion API
+        """
+        messages = [self.system_message]
+        if conversation_history:
+            messages.extend(conversation_history)
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    def estimate_request_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Prompt + completion budget, reusing the precomputed system prompt cost"""
+        variable = sum(estimate_tokens(m["content"]) for m in messages if m is not self.system_message)
+        return self.prompt_tokens + variable + self.max_tokens
+
+
+class PromptCacheStats:
+    """Prompt tokens vs. tokens served from the upstream prompt cache"""
+
+    def __init__(self):
+        """Initialize counters"""
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, usage) -> None:
+        """
+        Record usage from a chat completion
+
+        Args:
+            usage: `usage` object of the completion (may be None)
+        """
+        if usage is None:
+            return
+        self.requests += 1
+        self.prompt_tokens += usage.prompt_tokens or 0
+        self.completion_tokens += usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens += (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get counters and cached-token ratio"""
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_token_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+        }
+
+
+class PromptService:
+    """Registry of persona templates loaded once from disk"""
+
+    def __init__(self, personas_dir: Path, default_persona: str):
+        """
+        Initialize service
+
+        Args:
+            personas_dir: Directory with `<persona>.json` and prompt files
+            default_persona: Persona used when none is requested
+        """
+        self.personas_dir = personas_dir
+        self.default_persona = default_persona
+        self._personas: Dict[str, PersonaPrompt] = {}
+        self.cache_stats = PromptCacheStats()
+
+    def _load(self, key: str) -> PersonaPrompt:
+        config_path = self.personas_dir / f"{key}.json"
+        config = json.loads(config_path.read_text(encoding="utf-8"))
+        prompt_path = self.personas_dir / config.pop("prompt_file", f"{key}.txt")
+        persona = PersonaPrompt(
+            key=key,
+            name=config.pop("name", key),
+            system_prompt=prompt_path.read_text(encoding="utf-8").strip(),
+            temperature=config.pop("temperature", 0.8),
+            max_tokens=config.pop("max_tokens", 150),
+            extra=config
+        )
+        logger.info("Persona '%s' cargada (%s tokens de prompt)", key, persona.prompt_tokens)
+        return persona
+
+    def get(self, key: Optional[str] = None) -> PersonaPrompt:
+        """
+        Get a persona, loading and compiling it on first use
+
+        Args:
+            key: Persona identifier (defaults to settings.persona)
+
+        Returns:
+            Precompiled persona
+        """
+        key = key or self.default_persona
+        persona = self._personas.get(key)
+        if persona is None:
+            persona = self._load(key)
+            self._personas[key] = persona
+        return persona
+
+
+# Global service instance
+prompt_service = PromptService(
+    personas_dir=Path(settings.personas_dir) if settings.personas_dir else DEFAULT_PERSONAS_DIR,
+    default_persona=settings.persona
+)
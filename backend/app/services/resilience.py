@@ -0,0 +1,239 @@
+"""
+Resilience policy for the voice pipeline
+Per-stage deadline budgets, jittered retries and request hedging
+"""
+from typing import Awaitable, Callable, Dict, Optional
+from app.config import settings
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Etapas del turno de voz, en orden de ejecución
+STAGE_STT = "stt"
+STAGE_LLM = "llm"
+STAGE_TTS = "tts"
+STAGES = (STAGE_STT, STAGE_LLM, STAGE_TTS)
+
+
+def _stage_fractions() -> Dict[str, float]:
+    return {
+        STAGE_STT: settings.stt_budget_fraction,
+        STAGE_LLM: settings.llm_budget_fraction,
+        STAGE_TTS: settings.tts_budget_fraction,
+    }
+
+
+class TurnDeadline:
+    """Deadline for a whole voice turn, split into per-stage budgets"""
+
+    def __init__(self, total_seconds: Optional[float] = None):
+        """
+        Initialize deadline
+
+        Args:
+            total_seconds: Turn SLA in seconds (defaults to settings.turn_sla_seconds)
+        """
+        self.total_seconds = total_seconds or settings.turn_sla_seconds
+        self.started = time.monotonic()
+
+    def remaining(self) -> float:
+        """Seconds left until the turn deadline"""
+        return max(0.0, self.total_seconds - (time.monotonic() - self.started))
+
+    def stage_timeout(self, stage: str) -> float:
+        """
+        Budget for a stage: its share of the remaining time among the
+        stages still to run, so slack from earlier stages rolls forward
+
+        Args:
+            stage: Stage name (stt, llm, tts)
+
+        Returns:
+            Seconds available for the stage
+        """
+        fractions = _stage_fractions()
+        pending = sum(fractions[name] for name in STAGES[STAGES.index(stage):])
+        return self.remaining() * fractions[stage] / pending
+
+
+def standalone_stage_timeout() -> float:
+    """
+    Budget for a call made outside a voice turn: the turn SLA only applies
+    when a TurnDeadline is in effect, so long uploads are not cut short
+    """
+    return settings.standalone_stage_timeout_seconds
+
+
+class ResilienceStats:
+    """Counters for retries, timeouts and hedges per stage"""
+
+    def __init__(self):
+        """Initialize counters"""
+        self.attempts: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.retries: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.timeouts: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.failures: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.hedges_started = 0
+        self.hedges_won = 0
+
+    def snapshot(self) -> Dict[str, object]:
+        """Get counters"""
+        return {
+            "attempts": dict(self.attempts),
+            "retries": dict(self.retries),
+            "timeouts": dict(self.timeouts),
+            "failures": dict(self.failures),
+            "hedges_started": self.hedges_started,
+            "hedges_won": self.hedges_won,
+        }
+
+
+resilience_stats = ResilienceStats()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors, 429 and 5xx are retryable"""
+    import openai
+
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, (openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return False
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry number (1-based)"""
+    cap = min(settings.retry_max_delay_seconds, settings.retry_base_delay_seconds * (2 ** (attempt - 1)))
+    return random.uniform(0, cap)
+
+
+async def call_with_retry(
+    stage: str,
+    attempt: Callable[[], Awaitable],
+    timeout_seconds: float,
+    can_retry: Optional[Callable[[], bool]] = None
+):
+    """
+    Run an upstream call with a deadline and jittered retries
+
+    Each attempt gets whatever is left of the stage budget; retryable
+    errors are retried while the budget allows another attempt.
+
+    Args:
+        stage: Stage name (stt, llm, tts)
+        attempt: Coroutine factory performing one upstream call
+        timeout_seconds: Total budget for the stage
+        can_retry: Checked after any failure, timeouts included; False makes
+            the failure final (e.g. once bytes were streamed to the caller)
+
+    Returns:
+        Result of the first successful attempt
+    """
+    deadline = time.monotonic() + timeout_seconds
+    number = 0
+    while True:
+        number += 1
+        resilience_stats.attempts[stage] += 1
+        remaining = deadline - time.monotonic()
+        try:
+            return await asyncio.wait_for(attempt(), timeout=max(remaining, 0.001))
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                resilience_stats.timeouts[stage] += 1
+            delay = backoff_delay(number)
+            remaining = deadline - time.monotonic()
+            if (
+                not is_retryable(e)
+                or (can_retry is not None and not can_retry())
+                or number >= settings.retry_max_attempts
+                or remaining <= delay
+            ):
+                resilience_stats.failures[stage] += 1
+                if isinstance(e, asyncio.TimeoutError):
+                    raise asyncio.TimeoutError(
+                        f"{stage} exceeded its {timeout_seconds:.1f}s budget"
+                    ) from e
+                raise
+            resilience_stats.retries[stage] += 1
+            logger.warning(
+                "%s attempt %s failed (%s), retrying in %.0f ms",
+                stage, number, e.__class__.__name__, delay * 1000
+            )
+            await asyncio.sleep(delay)
+
+
+async def run_hedged(
+    attempt_factory: Callable[[Callable[[], bool]], Awaitable],
+    hedge_delay_seconds: float
+):
+    """
+    Run a call with an optional hedge
+
+    The primary attempt starts immediately. If it has not produced its
+    first byte after `hedge_delay_seconds`, a second identical attempt is
+    started; the first one to produce a byte wins and the other is cancelled.
+
+    Args:
+        attempt_factory: Receives a `claim()` callback; the attempt must call
+            it on its first byte and stop if it returns False
+        hedge_delay_seconds: Delay before firing the hedge
+
+    Returns:
+        Result of the winning attempt
+    """
+    winner = []
+    claimed = asyncio.Event()
+
+    def make_claim(index: int) -> Callable[[], bool]:
+        def claim() -> bool:
+            if not winner:
+                winner.append(index)
+                claimed.set()
+            return winner[0] == index
+        return claim
+
+    tasks = [asyncio.create_task(attempt_factory(make_claim(0)))]
+    claim_waiter = asyncio.create_task(claimed.wait())
+    try:
+        await asyncio.wait(
+            [tasks[0], claim_waiter],
+            timeout=hedge_delay_seconds,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        if not winner and not tasks[0].done():
+            resilience_stats.hedges_started += 1
+            logger.info("Hedging: no first byte after %.0f ms", hedge_delay_seconds * 1000)
+            tasks.append(asyncio.create_task(attempt_factory(make_claim(1))))
+
+        while not winner:
+            pending = [task for task in tasks if not task.done()]
+            finished = [task for task in tasks if task.done()]
+            for task in finished:
+                if not task.cancelled() and task.exception() is None:
+                    # Terminó sin producir bytes (respuesta vacía): también gana
+                    make_claim(tasks.index(task))()
+                    break
+            if winner:
+                break
+            if not pending:
+                raise finished[-1].exception()
+            await asyncio.wait(pending + [claim_waiter], return_when=asyncio.FIRST_COMPLETED)
+
+        for index, task in enumerate(tasks):
+            if index != winner[0]:
+                task.cancel()
+        if winner[0] == 1:
+            resilience_stats.hedges_won += 1
+        return await tasks[winner[0]]
+    finally:
+        claim_waiter.cancel()
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Marcar como recuperada la excepción del intento perdedor
+                task.exception()
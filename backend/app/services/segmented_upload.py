@@ -0,0 +1,229 @@
+"""
+Segmented utterance uploads
+The client cuts the recording at VAD pauses and uploads each segment while
+the user keeps speaking; every segment is transcribed as soon as it arrives,
+so when the last one lands only its own transcription is left on the turn's
+critical path
+
+Each segment must be a self-contained audio file (the client restarts its
+recorder at every cut). Sessions live in the worker's memory: with several
+workers the segments of one utterance need session affinity.
+"""
+from collections import OrderedDict
+from typing import Dict, List
+from app.config import settings
+from app.services.turn_persistence import TurnUsage
+import asyncio
+import io
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class UtteranceSession:
+    """Segments of one utterance and their transcription tasks"""
+
+    def __init__(self, user_id: int):
+        """
+        Initialize session
+
+        Args:
+            user_id: Owner of the utterance
+        """
+        self.user_id = user_id
+        self.created = time.monotonic()
+        self.updated = self.created
+        self.segments: Dict[int, asyncio.Task] = {}
+        self.usages: Dict[int, TurnUsage] = {}
+
+    def cancel(self) -> None:
+        """Cancel pending transcriptions"""
+        for task in self.segments.values():
+            if task.done():
+                if not task.cancelled():
+                    task.exception()  # marcar como consultada
+            else:
+                task.cancel()
+
+
+class SegmentedUploadStats:
+    """Counters for segmented uploads"""
+
+    def __init__(self):
+        """Initialize counters"""
+        self.utterances = 0
+        self.segments = 0
+        self.expired = 0
+        self.segment_errors = 0
+        self.total_tail_ms = 0.0
+        self.assembled = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get counters"""
+        return {
+            "utterances": self.utterances,
+            "segments": self.segments,
+            "expired": self.expired,
+            "segment_errors": self.segment_errors,
+            "assembled": self.assembled,
+            "avg_tail_ms": round(self.total_tail_ms / self.assembled, 2) if self.assembled else 0.0,
+        }
+
+
+class SegmentedUploadService:
+    """Per-utterance sessions transcribing segments as they arrive"""
+
+    def __init__(self, ttl_seconds: float, max_segments: int, max_sessions: int = 10000):
+        """
+        Initialize service
+
+        Args:
+            ttl_seconds: Idle time after which an unfinished utterance is dropped
+            max_segments: Maximum segments per utterance
+            max_sessions: Open utterances kept (the oldest is dropped first)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_segments = max_segments
+        self.max_sessions = max_sessions
+        self.stats = SegmentedUploadStats()
+        self._sessions: "OrderedDict[str, UtteranceSession]" = OrderedDict()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            utterance_id, session = next(iter(self._sessions.items()))
+            if now - session.updated < self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[utterance_id]
+            session.cancel()
+            self.stats.expired += 1
+
+    def _get(self, utterance_id: str, user_id: int) -> UtteranceSession:
+        session = self._sessions.get(utterance_id)
+        if session is None or session.user_id != user_id:
+            raise KeyError(utterance_id)
+        return session
+
+    def create(self, user_id: int) -> str:
+        """
+        Open an utterance
+
+        Args:
+            user_id: Owner of the utterance
+
+        Returns:
+            Utterance id
+        """
+        self._expire()
+        utterance_id = uuid.uuid4().hex
+        self._sessions[utterance_id] = UtteranceSession(user_id)
+        self.stats.utterances += 1
+        return utterance_id
+
+    def add_segment(
+        self,
+        openai_service,
+        utterance_id: str,
+        user_id: int,
+        index: int,
+        audio_bytes: bytes,
+        filename: str
+    ) -> None:
+        """
+        Store a segment and start transcribing it
+
+        Args:
+            openai_service: OpenAI service
+            utterance_id: Utterance id
+            user_id: Owner of the utterance
+            index: Segment position (0-based)
+            audio_bytes: Self-contained audio file of the segment
+            filename: File name (its extension tells Whisper the format)
+
+        Raises:
+            KeyError: Unknown or expired utterance
+            ValueError: Index out of range or already uploaded
+        """
+        session = self._get(utterance_id, user_id)
+        if index >= self.max_segments:
+            raise ValueError(f"segment index must be < {self.max_segments}")
+        if index in session.segments:
+            raise ValueError(f"segment {index} already uploaded")
+
+        audio_file = io.BytesIO(audio_bytes)
+        audio_file.name = filename
+        usage = TurnUsage()
+        session.usages[index] = usage
+        session.segments[index] = asyncio.create_task(
+            openai_service.transcribe_audio(audio_file, usage=usage)
+        )
+        session.updated = time.monotonic()
+        self._sessions.move_to_end(utterance_id)
+        self.stats.segments += 1
+
+    async def assemble(self, utterance_id: str, user_id: int, last_index: int, usage: TurnUsage) -> str:
+        """
+        Wait for the transcriptions of segments 0..last_index and join them
+
+        Args:
+            utterance_id: Utterance id
+            user_id: Owner of the utterance
+            last_index: Index of the final segment
+            usage: Turn usage receiving total audio duration and the STT tail latency
+
+        Returns:
+            Transcript of the whole utterance
+
+        Raises:
+            KeyError: Unknown or expired utterance
+            ValueError: Missing segments
+        """
+        session = self._get(utterance_id, user_id)
+        missing = [index for index in range(last_index + 1) if index not in session.segments]
+        if missing:
+            raise ValueError(f"missing segments: {missing}")
+        del self._sessions[utterance_id]
+
+        started = time.perf_counter()
+        tasks = [session.segments[index] for index in range(last_index + 1)]
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            # Segmentos posteriores al final (o todos si se cancela la petición)
+            session.cancel()
+        # El STT que queda en el camino crítico es la espera tras el último segmento
+        usage.stt_ms = (time.perf_counter() - started) * 1000
+
+        texts: List[str] = []
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                self.stats.segment_errors += 1
+                logger.warning("Segment %s transcription failed: %s", index, result)
+                raise result
+            texts.append(result.strip())
+        durations = [session.usages[index].audio_duration for index in range(last_index + 1)]
+        if all(duration is not None for duration in durations):
+            usage.audio_duration = sum(durations)
+
+        self.stats.assembled += 1
+        self.stats.total_tail_ms += usage.stt_ms
+        return " ".join(text for text in texts if text)
+
+    def discard(self, utterance_id: str, user_id: int) -> None:
+        """Drop an utterance and cancel its pending transcriptions"""
+        session = self._get(utterance_id, user_id)
+        del self._sessions[utterance_id]
+        session.cancel()
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get counters and open utterances"""
+        return {**self.stats.snapshot(), "open": len(self._sessions)}
+
+
+# Global service instance
+segmented_upload_service = SegmentedUploadService(
+    ttl_seconds=settings.segmented_upload_ttl_seconds,
+    max_segments=settings.segmented_upload_max_segments
+)
@@ -0,0 +1,346 @@
+"""
+Semantic answer cache
+Reuses answers (and their TTS audio) for questions already asked with
+different wording
+
+Normalized utterances are embedded and stored in a NumPy matrix
+memory-mapped on disk (`vectors.f32`), with one JSON line per entry in
+`entries.jsonl` and the audio in `audio/<slot>.mp3`. Lookups are a single
+matrix-vector product over the unit vectors of the same scope (persona and
+voice); hits close to the threshold are written to the audit log so false
+hits can be reviewed and the threshold tuned.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.config import settings
+import asyncio
+import json
+import logging
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger("app.semantic_cache.audit")
+
+try:
+    import numpy as np
+except ImportError:  # Dependencia opcional: sin ella la caché queda desactivada
+    np = None
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+# Mejores slots revisados por búsqueda; si ninguno es del ámbito, cuenta como fallo
+_TOP_CANDIDATES = 8
+
+
+def normalize_utterance(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+class CacheEntry:
+    """Cached answer for one utterance"""
+
+    def __init__(self, seq: int, slot: int, scope: str, utterance: str, answer: str, has_audio: bool = False):
+        """
+        Initialize entry
+
+        Args:
+            seq: Write sequence number (orders slot reuse)
+            slot: Row in the vector matrix
+            scope: Persona/voice the answer belongs to
+            utterance: Normalized utterance
+            answer: Assistant answer
+            has_audio: Whether the TTS audio is stored
+        """
+        self.seq = seq
+        self.slot = slot
+        self.scope = scope
+        self.utterance = utterance
+        self.answer = answer
+        self.has_audio = has_audio
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize entry"""
+        return {
+            "seq": self.seq,
+            "slot": self.slot,
+            "scope": self.scope,
+            "utterance": self.utterance,
+            "answer": self.answer,
+            "has_audio": self.has_audio,
+        }
+
+
+class SemanticLookup:
+    """Result of a lookup: the query embedding and the hit, if any"""
+
+    def __init__(self, scope: str, utterance: str, embedding, entry: Optional[CacheEntry] = None,
+                 similarity: float = 0.0, audio: Optional[bytes] = None):
+        """Initialize lookup (a miss unless `entry` is set)"""
+        self.scope = scope
+        self.utterance = utterance
+        self.embedding = embedding
+        self.entry = entry
+        self.similarity = similarity
+        self.audio = audio
+
+    @property
+    def hit(self) -> bool:
+        """Whether a cached answer was found"""
+        return self.entry is not None
+
+
+class SemanticCacheStats:
+    """Lookup counters"""
+
+    def __init__(self):
+        """Initialize counters"""
+        self.lookups = 0
+        self.hits = 0
+        self.audio_hits = 0
+        self.borderline_hits = 0
+        self.errors = 0
+        self.stores = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get counters and hit rate"""
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "audio_hits": self.audio_hits,
+            "borderline_hits": self.borderline_hits,
+            "errors": self.errors,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+class SemanticCache:
+    """Nearest-neighbor answer cache over a memory-mapped embedding matrix"""
+
+    def __init__(
+        self,
+        enabled: bool,
+        directory: Path,
+        capacity: int,
+        dimensions: int,
+        threshold: float,
+        audit_margin: float
+    ):
+        """
+        Initialize cache (files are opened on first use)
+
+        Args:
+            enabled: Whether the cache is used
+            directory: Directory holding vectors, entries and audio
+            capacity: Maximum entries (the oldest slot is overwritten when full)
+            dimensions: Embedding dimensions
+            threshold: Minimum cosine similarity for a hit
+            audit_margin: Hits below threshold + margin are audited
+        """
+        self.enabled = enabled and np is not None
+        if enabled and np is None:
+            logger.warning("SEMANTIC_CACHE_ENABLED requires numpy; semantic cache disabled")
+        self.directory = directory
+        self.capacity = capacity
+        self.dimensions = dimensions
+        self.threshold = threshold
+        self.audit_margin = audit_margin
+        self.stats = SemanticCacheStats()
+        self._vectors = None
+        self._entries: List[Optional[CacheEntry]] = []
+        self._next_seq = 0
+        self._lock = asyncio.Lock()
+
+    # --- Storage -----------------------------------------------------------
+
+    def _open(self) -> None:
+        if self._vectors is not None:
+            return
+        (self.directory / "audio").mkdir(parents=True, exist_ok=True)
+        vectors_path = self.directory / "vectors.f32"
+        mode = "r+" if vectors_path.exists() else "w+"
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dimensions))
+        self._entries = [None] * self.capacity
+
+        entries_path = self.directory / "entries.jsonl"
+        if entries_path.exists():
+            # La última línea de cada slot es su versión vigente
+            lines = entries_path.read_text(encoding="utf-8").splitlines()
+            for line in lines:
+                data = json.loads(line)
+                if data["slot"] < self.capacity:
+                    self._entries[data["slot"]] = CacheEntry(**data)
+                    self._next_seq = max(self._next_seq, data["seq"] + 1)
+            if len(lines) > 2 * self.capacity:
+                # Compactar: una línea por entrada vigente
+                live = sorted((e for e in self._entries if e is not None), key=lambda e: e.seq)
+                entries_path.write_text(
+                    "".join(json.dumps(e.to_dict(), ensure_ascii=False) + "\n" for e in live),
+                    encoding="utf-8"
+                )
+        loaded = sum(1 for entry in self._entries if entry is not None)
+        logger.info("Semantic cache opened with %s entries", loaded)
+
+    def _audio_path(self, slot: int) -> Path:
+        return self.directory / "audio" / f"{slot}.mp3"
+
+    def _append_entry(self, entry: CacheEntry) -> None:
+        with open(self.directory / "entries.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry.to_dict(), ensure_ascii=False) + "\n")
+
+    def _snapshot(self) -> tuple:
+        self._open()
+        return self._vectors, list(self._entries)
+
+    def _search(self, scope: str, query, vectors, entries: List[Optional[CacheEntry]]) -> Optional[tuple]:
+        # Sin lock: `entries` se copió antes del producto y cada candidato se
+        # valida contra el slot vigente, así un store concurrente solo lo descarta
+        similarities = vectors @ query
+        k = min(_TOP_CANDIDATES, len(similarities))
+        top = np.argpartition(similarities, -k)[-k:]
+        for slot in top[np.argsort(similarities[top])[::-1]]:
+            slot = int(slot)
+            similarity = float(similarities[slot])
+            if similarity < self.threshold:
+                break
+            entry = entries[slot]
+            if entry is None or entry.scope != scope:
+                continue
+            audio = self._audio_path(slot).read_bytes() if entry.has_audio else None
+            if self._entries[slot] is not entry:
+                continue
+            return entry, similarity, audio
+        return None
+
+    def _write(self, lookup: SemanticLookup, answer: str, audio: Optional[bytes]) -> None:
+        self._open()
+        seq = self._next_seq
+        self._next_seq += 1
+        slot = seq % self.capacity
+        entry = CacheEntry(seq, slot, lookup.scope, lookup.utterance, answer, has_audio=audio is not None)
+        # Vaciar el slot antes de tocar audio y vector: las búsquedas en curso lo descartan
+        self._entries[slot] = None
+        if audio is not None:
+            self._audio_path(slot).write_bytes(audio)
+        self._vectors[slot] = lookup.embedding
+        self._vectors.flush()
+        self._entries[slot] = entry
+        self._append_entry(entry)
+
+    # --- API ---------------------------------------------------------------
+
+    async def lookup(self, openai_service, text: str, scope: str) -> Optional[SemanticLookup]:
+        """
+        Look up a cached answer for an utterance
+
+        Args:
+            openai_service: Service used to embed the utterance
+            text: User utterance
+            scope: Persona/voice the answer must belong to
+
+        Returns:
+            Lookup result (check `.hit`), or None when the cache is disabled
+            or the embedding failed (callers treat it as a plain miss)
+        """
+        if not self.enabled:
+            return None
+        utterance = normalize_utterance(text)
+        if not utterance:
+            return None
+        self.stats.lookups += 1
+        try:
+            vector = await asyncio.wait_for(
+                openai_service.embed_text(utterance),
+                timeout=settings.semantic_cache_timeout_seconds
+            )
+            query = np.asarray(vector, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            async with self._lock:
+                vectors, entries = await asyncio.to_thread(self._snapshot)
+            found = await asyncio.to_thread(self._search, scope, query, vectors, entries)
+        except Exception as e:
+            self.stats.errors += 1
+            logger.warning("Semantic cache lookup failed: %s", e)
+            return None
+
+        lookup = SemanticLookup(scope, utterance, query)
+        if found is None:
+            return lookup
+
+        lookup.entry, lookup.similarity, lookup.audio = found
+        self.stats.hits += 1
+        if lookup.audio is not None:
+            self.stats.audio_hits += 1
+        if lookup.similarity < self.threshold + self.audit_margin:
+            self.stats.borderline_hits += 1
+            audit_logger.info(json.dumps({
+                "event": "borderline_hit",
+                "scope": scope,
+                "query": utterance,
+                "matched": lookup.entry.utterance,
+                "slot": lookup.entry.slot,
+                "similarity": round(lookup.similarity, 4),
+            }, ensure_ascii=False))
+        logger.info("Semantic cache hit (%.3f): '%.50s'", lookup.similarity, utterance)
+        return lookup
+
+    async def store(self, lookup: Optional[SemanticLookup], answer: str, audio: Optional[bytes] = None) -> None:
+        """
+        Store the answer for a missed lookup, or attach audio to a hit
+        that did not have it yet
+
+        Args:
+            lookup: Result of `lookup` (no-op when None)
+            answer: Assistant answer
+            audio: TTS audio of the answer (optional)
+        """
+        if lookup is None or (lookup.hit and (lookup.audio is not None or audio is None)):
+            return
+        try:
+            async with self._lock:
+                if lookup.hit:
+                    await asyncio.to_thread(self._attach_audio, lookup.entry, audio)
+                else:
+                    await asyncio.to_thread(self._write, lookup, answer, audio)
+                    self.stats.stores += 1
+        except Exception as e:
+            self.stats.errors += 1
+            logger.warning("Semantic cache store failed: %s", e)
+
+    def _attach_audio(self, entry: CacheEntry, audio: bytes) -> None:
+        if self._entries[entry.slot] is not entry:
+            # El slot se reutilizó para otra pregunta desde el lookup
+            return
+        self._audio_path(entry.slot).write_bytes(audio)
+        entry.has_audio = True
+        self._append_entry(entry)
+
+    async def close(self) -> None:
+        """Wait for in-progress stores and flush the vectors file"""
+        async with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get cache metrics"""
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": sum(1 for entry in self._entries if entry is not None),
+            **self.stats.snapshot(),
+        }
+
+
+# Global cache instance
+semantic_cache = SemanticCache(
+    enabled=settings.semantic_cache_enabled,
+    directory=Path(settings.semantic_cache_dir),
+    capacity=settings.semantic_cache_capacity,
+    dimensions=settings.embedding_dimensions,
+    threshold=settings.semantic_cache_threshold,
+    audit_margin=settings.semantic_cache_audit_margin
+)
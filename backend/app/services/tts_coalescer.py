@@ -0,0 +1,152 @@
+"""
+Single-flight coalescing for TTS requests
+Concurrent identical requests share one upstream call and its streamed bytes
+"""
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.services.openai_service import OpenAIService
+from app.services.upstream_scheduler import PRIORITY_INTERACTIVE
+from app.services.resilience import TurnDeadline
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+TTS_FORMAT = "mp3"
+
+
+class _Flight:
+    """One in-flight upstream TTS call and the chunks received so far"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """Wake every waiter (each notification uses a fresh event)"""
+        event, self.changed = self.changed, asyncio.Event()
+        event.set()
+
+
+class TTSCoalescer:
+    """Share identical in-flight TTS calls keyed on (text, voice, model, format)"""
+
+    def __init__(self):
+        """Initialize coalescer"""
+        self._flights: Dict[Tuple[str, str, str, str], _Flight] = {}
+        self.flights_started = 0
+        self.requests_coalesced = 0
+
+    async def _run(
+        self,
+        key,
+        flight: _Flight,
+        service: OpenAIService,
+        text: str,
+        voice: str,
+        priority: int,
+        deadline: Optional[TurnDeadline],
+        timeout_seconds: Optional[float]
+    ):
+        """Run the upstream call and publish chunks to the flight"""
+        def on_chunk(chunk: bytes) -> None:
+            flight.chunks.append(chunk)
+            flight.notify()
+
+        try:
+            await service.text_to_speech(
+                text=text,
+                voice=voice,
+                priority=priority,
+                deadline=deadline,
+                on_chunk=on_chunk,
+                timeout_seconds=timeout_seconds
+            )
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.notify()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def stream(
+        self,
+        service: OpenAIService,
+        text: str,
+        voice: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[TurnDeadline] = None,
+        timeout_seconds: Optional[float] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream TTS audio, joining an identical in-flight request if there is one
+
+        The upstream call runs in its own task, so a disconnecting client does
+        not cancel it for the other waiters.
+
+        Args:
+            service: OpenAI service used for the upstream call
+            text: Text to convert
+            voice: Voice option (optional, uses default from settings)
+            priority: Upstream scheduling priority
+            deadline: Turn deadline (applies to the upstream call when this
+                request starts the flight)
+            timeout_seconds: Stage budget overriding the deadline (idem)
+
+        Yields:
+            Audio chunks
+        """
+        selected_voice = voice or service.tts_voice
+        key = (text, selected_voice, service.tts_model, TTS_FORMAT)
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            self.flights_started += 1
+            flight.task = asyncio.create_task(
+                self._run(key, flight, service, text, selected_voice, priority, deadline, timeout_seconds)
+            )
+        else:
+            self.requests_coalesced += 1
+            logger.info("TTS request coalesced with in-flight call")
+
+        index = 0
+        while True:
+            event = flight.changed
+            while index < len(flight.chunks):
+                yield flight.chunks[index]
+                index += 1
+            if flight.done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+            await event.wait()
+
+    async def synthesize(
+        self,
+        service: OpenAIService,
+        text: str,
+        voice: Optional[str] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[TurnDeadline] = None,
+        timeout_seconds: Optional[float] = None
+    ) -> bytes:
+        """Coalesced TTS returning the complete audio"""
+        chunks = self.stream(service, text, voice, priority, deadline, timeout_seconds)
+        return b"".join([chunk async for chunk in chunks])
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get coalescing metrics"""
+        return {
+            "in_flight": len(self._flights),
+            "flights_started": self.flights_started,
+            "requests_coalesced": self.requests_coalesced,
+        }
+
+
+# Global coalescer instance
+tts_coalescer = TTSCoalescer()
@@ -0,0 +1,292 @@
+"""
+Turn persistence service
+Writes one conversation turn (user + assistant messages) in a single transaction
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+from app.database import Conversation, Message, SessionLocal, get_engine
+from app.services.conversation_resolver import active_conversation_resolver
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TurnUsage:
+    """Sizes, latencies and token usage of one turn, stored with its messages"""
+
+    def __init__(self):
+        """Initialize empty usage (unknown values stay None)"""
+        self.audio_duration: Optional[float] = None
+        self.stt_ms: Optional[float] = None
+        self.llm_ms: Optional[float] = None
+        self.tts_ms: Optional[float] = None
+        self.model: Optional[str] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.tts_characters: Optional[int] = None
+
+    def record_completion(self, model: str, latency_ms: float, usage=None) -> None:
+        """
+        Record the chat completion of the turn
+
+        Args:
+            model: Model that answered
+            latency_ms: Completion latency
+            usage: Completion `usage` object (optional)
+        """
+        self.model = model
+        self.llm_ms = latency_ms
+        if usage is not None:
+            self.prompt_tokens = usage.prompt_tokens
+            self.completion_tokens = usage.completion_tokens
+
+
+class TurnPersistenceStats:
+    """Aggregated commit count and latency of persisted turns"""
+
+    def __init__(self):
+        """Initialize counters"""
+        self.turns = 0
+        self.failures = 0
+        self.commits = 0
+        self.statements = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.last_latency_ms = 0.0
+
+    def record(self, statements: int, commits: int, latency_ms: float) -> None:
+        """
+        Record a persisted turn
+
+        Args:
+            statements: SQL statements executed for the turn
+            commits: Commits issued for the turn
+            latency_ms: Wall time spent persisting the turn
+        """
+        self.turns += 1
+        self.statements += statements
+        self.commits += commits
+        self.total_latency_ms += latency_ms
+        self.last_latency_ms = latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+
+    def record_failure(self) -> None:
+        """Record a turn whose transaction was rolled back"""
+        self.failures += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Get current statistics
+
+        Returns:
+            Dictionary with counters and per-turn averages
+        """
+        turns = self.turns or 1
+        return {
+            "turns": self.turns,
+            "failures": self.failures,
+            "commits": self.commits,
+            "statements": self.statements,
+            "commits_per_turn": self.commits / turns,
+            "statements_per_turn": self.statements / turns,
+            "avg_latency_ms": round(self.total_latency_ms / turns, 2),
+            "max_latency_ms": round(self.max_latency_ms, 2),
+            "last_latency_ms": round(self.last_latency_ms, 2),
+        }
+
+
+class TurnPersistenceService:
+    """Persist voice/chat turns with one commit per turn"""
+
+    def __init__(self):
+        """Initialize service"""
+        self.stats = TurnPersistenceStats()
+        # Hooks llamados tras el commit cuando el turno creó la conversación
+        self.on_conversation_created: List[Callable[[int, int], None]] = []
+        self._pending: Set[asyncio.Task] = set()
+
+    def persist_turn(
+        self,
+        db: Session,
+        user_id: int,
+        user_content: str,
+        assistant_content: str,
+        audio_duration: Optional[float] = None,
+        usage: Optional[TurnUsage] = None
+    ) -> int:
+        """
+        Persist a user/assistant turn
+
+        The conversation timestamp bump and both messages are written in
+        the same transaction: one UPDATE on the active conversation and one
+        multi-row ``INSERT ... RETURNING`` for the messages, then a single
+        commit. If the active conversation is not cached it is resolved (or
+        inserted) inside that same transaction.
+
+        Args:
+            db: Database session
+            user_id: User identifier
+            user_content: User message content
+            assistant_content: Assistant response content
+            audio_duration: Duration of the user audio in seconds (optional)
+            usage: Latencies and token usage stored in the same INSERT (optional)
+
+        Returns:
+            Conversation id the turn was appended to
+        """
+        start = time.perf_counter()
+        now = datetime.now()
+        executed = []
+
+        def count_statement(*args):
+            executed.append(1)
+
+        connection = db.connection()
+        event.listen(connection, "before_cursor_execute", count_statement)
+        try:
+            conversation_id, created = active_conversation_resolver.resolve(db, user_id)
+
+            bumped = db.execute(
+                update(Conversation)
+                .where(Conversation.conversation_id == conversation_id)
+                .values(updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+
+            if bumped.rowcount == 0:
+                # La conversación en caché ya no existe: resolver de nuevo
+                active_conversation_resolver.invalidate(user_id)
+                conversation_id, created = active_conversation_resolver.resolve(db, user_id)
+                db.execute(
+                    update(Conversation)
+                    .where(Conversation.conversation_id == conversation_id)
+                    .values(updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+
+            usage = usage or TurnUsage()
+            rows: List[Dict] = [
+                {
+                    "conversation_id": conversation_id,
+                    "user_id": user_id,
+                    "role": "user",
+                    "content": user_content,
+                    "audio_duration": audio_duration if audio_duration is not None else usage.audio_duration,
+                    "created_at": now,
+                    "stt_ms": usage.stt_ms,
+                    "llm_ms": None,
+                    "tts_ms": None,
+                    "model": None,
+                    "prompt_tokens": None,
+                    "completion_tokens": None,
+                    "tts_characters": None,
+                },
+                {
+                    "conversation_id": conversation_id,
+                    "user_id": user_id,
+                    "role": "assistant",
+                    "content": assistant_content,
+                    "audio_duration": None,
+                    # La respuesta va siempre después de la pregunta en el historial
+                    "created_at": now + timedelta(microseconds=1),
+                    "stt_ms": None,
+                    "llm_ms": usage.llm_ms,
+                    "tts_ms": usage.tts_ms,
+                    "model": usage.model,
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "tts_characters": usage.tts_characters,
+                },
+            ]
+            db.execute(insert(Message).returning(Message.message_id), rows)
+
+            db.commit()
+            active_conversation_resolver.remember(user_id, conversation_id)
+        except Exception:
+            db.rollback()
+            active_conversation_resolver.invalidate(user_id)
+            self.stats.record_failure()
+            raise
+        finally:
+            event.remove(connection, "before_cursor_execute", count_statement)
+
+        statements = len(executed)
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.stats.record(statements=statements, commits=1, latency_ms=latency_ms)
+        logger.debug(
+            "Turn persisted in conversation %s: %d statements, 1 commit, %.1f ms",
+            conversation_id, statements, latency_ms
+        )
+
+        if created:
+            for hook in self.on_conversation_created:
+                try:
+                    hook(conversation_id, user_id)
+                except Exception as e:
+                    logger.error("Conversation created hook failed: %s", e)
+        return conversation_id
+
+    def persist_turn_background(
+        self,
+        user_id: int,
+        user_content: str,
+        assistant_content: str,
+        usage: Optional[TurnUsage] = None
+    ) -> asyncio.Task:
+        """
+        Persist a turn in a worker thread with its own session, off the
+        response path (errors are logged)
+
+        Returns:
+            Task resolving to the conversation id (None on failure)
+        """
+        def save() -> Optional[int]:
+            get_engine()
+            db = SessionLocal()
+            try:
+                conversation_id = self.persist_turn(
+                    db,
+                    user_id=user_id,
+                    user_content=user_content,
+                    assistant_content=assistant_content,
+                    usage=usage
+                )
+                logger.info("✅ Mensajes guardados en conversación %s", conversation_id)
+                return conversation_id
+            except Exception as e:
+                logger.error("❌ Error guardando en BD: %s", e)
+                return None
+            finally:
+                db.close()
+
+        task = asyncio.create_task(asyncio.to_thread(save))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    @property
+    def pending_writes(self) -> int:
+        """Background writes not finished yet"""
+        return len(self._pending)
+
+    async def flush(self, timeout: float) -> int:
+        """
+        Wait for background writes
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Writes still pending after the timeout
+        """
+        if self._pending:
+            await asyncio.wait(set(self._pending), timeout=timeout)
+        return len(self._pending)
+
+
+# Global service instance
+turn_persistence_service = TurnPersistenceService()
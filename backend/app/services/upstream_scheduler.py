@@ -0,0 +1,257 @@
+"""
+Upstream scheduler for OpenAI calls
+Per-model concurrency limits, request/token rate limits and request priorities
+"""
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Prioridades (menor valor = se atiende antes)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize bucket
+
+        Args:
+            per_minute: Units refilled per minute
+            capacity: Maximum burst size (defaults to one minute of refill)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """
+        Wait until `amount` units are available and consume them
+
+        Args:
+            amount: Units to consume (capped at the bucket capacity)
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class PrioritySemaphore:
+    """Semaphore that wakes waiters by priority, then FIFO"""
+
+    def __init__(self, limit: int):
+        """
+        Initialize semaphore
+
+        Args:
+            limit: Maximum concurrent holders
+        """
+        self.limit = limit
+        self.in_use = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of tasks waiting for a slot"""
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    async def acquire(self, priority: int) -> None:
+        """
+        Acquire a slot
+
+        Args:
+            priority: Request priority (lower is served first)
+        """
+        if self.in_use < self.limit and not self.queue_depth:
+            self.in_use += 1
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Si el slot ya fue concedido, devolverlo
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Release a slot, handing it to the highest-priority waiter"""
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.in_use -= 1
+
+
+class ModelLimiter:
+    """Concurrency and rate limits for a single upstream model"""
+
+    def __init__(
+        self,
+        model: str,
+        max_concurrency: int,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0
+    ):
+        """
+        Initialize limiter
+
+        Args:
+            model: Upstream model name
+            max_concurrency: Maximum in-flight requests
+            requests_per_minute: Request rate limit (0 disables it)
+            tokens_per_minute: Token rate limit (0 disables it)
+        """
+        self.model = model
+        self.semaphore = PrioritySemaphore(max_concurrency)
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.granted = 0
+        self.granted_by_priority: Dict[int, int] = {}
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, tokens: int = 0):
+        """
+        Hold an upstream slot for the duration of the block
+
+        Args:
+            priority: Request priority (lower is served first)
+            tokens: Estimated tokens consumed by the request
+        """
+        start = time.perf_counter()
+        await self.semaphore.acquire(priority)
+        try:
+            if self.request_bucket:
+                await self.request_bucket.acquire(1)
+            if self.token_bucket and tokens:
+                await self.token_bucket.acquire(tokens)
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        self.granted += 1
+        self.granted_by_priority[priority] = self.granted_by_priority.get(priority, 0) + 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        if wait_ms > 1000:
+            logger.warning("Upstream %s: waited %.0f ms for a slot", self.model, wait_ms)
+
+        try:
+            yield
+        finally:
+            self.semaphore.release()
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get limiter metrics"""
+        granted = self.granted or 1
+        return {
+            "max_concurrency": self.semaphore.limit,
+            "in_flight": self.semaphore.in_use,
+            "queue_depth": self.semaphore.queue_depth,
+            "granted": self.granted,
+            "granted_by_priority": dict(self.granted_by_priority),
+            "avg_wait_ms": round(self.total_wait_ms / granted, 2),
+            "max_wait_ms": round(self.max_wait_ms, 2),
+        }
+
+
+class UpstreamScheduler:
+    """Registry of per-model limiters in front of OpenAIService"""
+
+    def __init__(self):
+        """Initialize scheduler with limits from settings"""
+        self.limiters: Dict[str, ModelLimiter] = {}
+        self.configure(
+            settings.whisper_model,
+            settings.whisper_max_concurrency,
+            settings.whisper_requests_per_minute
+        )
+        self.configure(
+            settings.gpt_model,
+            settings.gpt_max_concurrency,
+            settings.gpt_requests_per_minute,
+            settings.gpt_tokens_per_minute
+        )
+        self.configure(
+            settings.tts_model,
+            settings.tts_max_concurrency,
+            settings.tts_requests_per_minute
+        )
+
+    def configure(
+        self,
+        model: str,
+        max_concurrency: int,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0
+    ) -> ModelLimiter:
+        """
+        Register (or replace) limits for a model
+
+        Args:
+            model: Upstream model name
+            max_concurrency: Maximum in-flight requests
+            requests_per_minute: Request rate limit (0 disables it)
+            tokens_per_minute: Token rate limit (0 disables it)
+
+        Returns:
+            The model limiter
+        """
+        limiter = ModelLimiter(model, max_concurrency, requests_per_minute, tokens_per_minute)
+        self.limiters[model] = limiter
+        return limiter
+
+    def limiter(self, model: str) -> ModelLimiter:
+        """Get the limiter for a model, creating a default one if unknown"""
+        if model not in self.limiters:
+            self.configure(model, settings.upstream_default_max_concurrency)
+        return self.limiters[model]
+
+    def slot(self, model: str, priority: int = PRIORITY_INTERACTIVE, tokens: int = 0):
+        """
+        Hold an upstream slot for a model
+
+        Usage:
+            async with upstream_scheduler.slot(model, PRIORITY_BATCH):
+                ...
+        """
+        return self.limiter(model).slot(priority=priority, tokens=tokens)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Get metrics for all models"""
+        return {model: limiter.snapshot() for model, limiter in self.limiters.items()}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+# Global scheduler instance
+upstream_scheduler = UpstreamScheduler()
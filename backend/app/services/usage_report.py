@@ -0,0 +1,90 @@
+"""
+Usage report service
+Per-user, per-day usage and estimated cost from the usage columns stored
+with each message (served by the (user_id, created_at) index)
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import Message
+from app.services.model_router import model_router
+
+
+def _cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prices = model_router.prices.get(model, {})
+    return (prompt_tokens * prices.get("input", 0) + completion_tokens * prices.get("output", 0)) / 1_000_000
+
+
+def get_daily_usage(db: Session, user_id: int, days: int) -> List[Dict[str, Any]]:
+    """
+    Aggregate a user's turns per day
+
+    Args:
+        db: Database session
+        user_id: User whose usage is reported
+        days: Days back from now
+
+    Returns:
+        One entry per day (newest first) with totals, per-model tokens and estimated cost in USD
+    """
+    since = datetime.now() - timedelta(days=days)
+    day = func.date(Message.created_at)
+    rows = db.query(
+        day.label("day"),
+        Message.model,
+        func.sum(case((Message.role == "assistant", 1), else_=0)).label("turns"),
+        func.coalesce(func.sum(Message.audio_duration), 0).label("audio_seconds"),
+        func.coalesce(func.sum(Message.stt_ms), 0).label("stt_ms"),
+        func.coalesce(func.sum(Message.llm_ms), 0).label("llm_ms"),
+        func.coalesce(func.sum(Message.tts_ms), 0).label("tts_ms"),
+        func.coalesce(func.sum(Message.prompt_tokens), 0).label("prompt_tokens"),
+        func.coalesce(func.sum(Message.completion_tokens), 0).label("completion_tokens"),
+        func.coalesce(func.sum(Message.tts_characters), 0).label("tts_characters"),
+    ).filter(
+        Message.user_id == user_id,
+        Message.created_at >= since
+    ).group_by(day, Message.model).all()
+
+    # Las filas del usuario (sin modelo) aportan audio y STT; las del asistente, LLM y TTS
+    report: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        key = str(row.day)
+        entry = report.setdefault(key, {
+            "day": key,
+            "turns": 0,
+            "audio_seconds": 0.0,
+            "stt_ms": 0.0,
+            "llm_ms": 0.0,
+            "tts_ms": 0.0,
+            "tts_characters": 0,
+            "models": {},
+            "cost_usd": 0.0,
+        })
+        entry["turns"] += row.turns or 0
+        entry["audio_seconds"] += row.audio_seconds
+        entry["stt_ms"] += row.stt_ms
+        entry["llm_ms"] += row.llm_ms
+        entry["tts_ms"] += row.tts_ms
+        entry["tts_characters"] += row.tts_characters
+        if row.model:
+            cost = _cost(row.model, row.prompt_tokens, row.completion_tokens)
+            entry["models"][row.model] = {
+                "turns": row.turns or 0,
+                "prompt_tokens": row.prompt_tokens,
+                "completion_tokens": row.completion_tokens,
+                "cost_usd": round(cost, 6),
+            }
+            entry["cost_usd"] += cost
+
+    for entry in report.values():
+        entry["cost_usd"] = round(
+            entry["cost_usd"]
+            + entry["audio_seconds"] / 60 * settings.stt_price_per_minute
+            + entry["tts_characters"] * settings.tts_price_per_million_characters / 1_000_000,
+            6
+        )
+        for key in ("audio_seconds", "stt_ms", "llm_ms", "tts_ms"):
+            entry[key] = round(entry[key], 1)
+    return sorted(report.values(), key=lambda entry: entry["day"], reverse=True)
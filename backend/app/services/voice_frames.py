@@ -0,0 +1,44 @@
+"""
+Length-prefixed binary framing for voice interaction responses
+
+Each frame is a 1-byte type, a 4-byte big-endian payload length and the
+payload. Text frames carry UTF-8; audio frames carry raw MP3 bytes.
+The transcript and response text are sent first so the client can render
+them while the audio is still streaming.
+"""
+import json
+import struct
+
+MEDIA_TYPE = "application/x-voice-frames"
+
+FRAME_TRANSCRIPT = 0x01
+FRAME_RESPONSE_TEXT = 0x02
+FRAME_AUDIO = 0x03
+FRAME_END = 0x04
+FRAME_ERROR = 0x05
+
+_HEADER = struct.Struct(">BI")
+
+
+def encode_frame(frame_type: int, payload: bytes = b"") -> bytes:
+    """
+    Encode one frame
+
+    Args:
+        frame_type: Frame type constant
+        payload: Frame payload
+
+    Returns:
+        Encoded frame bytes
+    """
+    return _HEADER.pack(frame_type, len(payload)) + payload
+
+
+def text_frame(frame_type: int, text: str) -> bytes:
+    """Encode a UTF-8 text frame"""
+    return encode_frame(frame_type, text.encode("utf-8"))
+
+
+def error_frame(detail: str) -> bytes:
+    """Encode an error frame with a JSON payload"""
+    return encode_frame(FRAME_ERROR, json.dumps({"detail": detail}).encode("utf-8"))
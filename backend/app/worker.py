@@ -0,0 +1,17 @@
+"""
+Out-of-process background job worker
+Executes jobs stored in the `background_jobs` table (JOB_QUEUE_MODE=external)
+
+Usage:
+    python -m app.worker
+"""
+from app.logging_config import setup_logging
+from app.services.job_queue import job_queue
+import app.services.background_tasks  # noqa: F401 (registra los handlers)
+import asyncio
+
+setup_logging()
+
+
+if __name__ == "__main__":
+    asyncio.run(job_queue.run_external_worker())
@@ -0,0 +1,89 @@
+"""
+Auth overhead benchmark
+
+Measures the per-request cost of authorizing a voice call: a full
+`jwt.decode` (signature verification), the cached verification fast path,
+the claims-only dependency used by voice endpoints and, optionally, the
+user lookup in the database that used to run on every request.
+
+Usage (from backend/):
+    python -m benchmarks.auth --iterations 20000
+    python -m benchmarks.auth --iterations 2000 --db   # needs DB and an existing user
+"""
+import argparse
+import statistics
+import time
+
+
+def time_per_call(func, iterations: int, runs: int = 5) -> float:
+    """Median microseconds per call over several runs"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter() - start) / iterations * 1_000_000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--db", action="store_true", help="Also time the per-request user lookup")
+    parser.add_argument("--username", default="benchmark")
+    args = parser.parse_args()
+
+    from jose import jwt
+    from app.auth import (
+        ACTIVE_KID,
+        ALGORITHM,
+        SIGNING_KEYS,
+        create_access_token,
+        decode_access_token,
+        get_token_user,
+        verification_cache
+    )
+
+    token = create_access_token({"sub": args.username, "uid": 1, "active": True})
+    key = SIGNING_KEYS[ACTIVE_KID]
+
+    def full_decode():
+        jwt.decode(token, key, algorithms=[ALGORITHM])
+
+    def uncached():
+        verification_cache._payloads.clear()
+        decode_access_token(token)
+
+    def cached():
+        decode_access_token(token)
+
+    def claims_user():
+        get_token_user(decode_access_token(token))
+
+    results = [
+        ("jwt.decode (signature verification)", time_per_call(full_decode, args.iterations)),
+        ("decode_access_token, cache miss", time_per_call(uncached, args.iterations)),
+        ("decode_access_token, cache hit", time_per_call(cached, args.iterations)),
+        ("claims-only user (voice endpoints)", time_per_call(claims_user, args.iterations)),
+    ]
+
+    if args.db:
+        from app.database import SessionLocal, User, get_engine
+
+        get_engine()
+        db = SessionLocal()
+        try:
+            def db_lookup():
+                db.query(User).filter(User.username == args.username).first()
+                db.rollback()
+
+            results.append(("user lookup in DB (previous hot path)", time_per_call(db_lookup, args.iterations, runs=3)))
+        finally:
+            db.close()
+
+    for name, micros in results:
+        print(f"{name:42s} {micros:10.1f} µs/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Logging overhead benchmark
+
+Emits the log lines of a typical voice turn and measures the time spent in
+the request path per turn for:
+- sync: the previous setup (basicConfig-style StreamHandler, f-strings)
+- queued: app.logging_config (queue handler, lazy %-formatting, JSON in
+  the listener thread), with and without sampling of INFO logs
+
+Output goes to /dev/null so the numbers reflect formatting and handler cost.
+
+Usage (from backend/):
+    python -m benchmarks.log_overhead --turns 20000
+"""
+import argparse
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueListener
+
+TRANSCRIPT = "¿Qué tiempo va a hacer mañana en Barcelona por la tarde?" * 2
+RESPONSE = "Mañana por la tarde se esperan cielos despejados y unos veinte grados." * 3
+
+
+def turn_fstrings(logger: logging.Logger, username: str) -> None:
+    """Log lines of one turn, formatted eagerly like the previous code"""
+    logger.info(f"User {username} - Quick interaction started")
+    logger.info(f"Starting audio transcription")
+    logger.info(f"Transcription successful: {TRANSCRIPT[:50]}...")
+    logger.info(f"✅ Transcription: {TRANSCRIPT}")
+    logger.info(f"Getting streaming chat completion")
+    logger.info(f"Streaming chat completion successful")
+    logger.info(f"✅ GPT response: {RESPONSE[:50]}...")
+    logger.info(f"Converting text to speech")
+    logger.info(f"TTS conversion successful, audio size: {48213} bytes")
+    logger.info(f"✅ Mensajes guardados")
+    logger.info(f"✅ Quick interaction complete")
+
+
+def turn_lazy(logger: logging.Logger, username: str) -> None:
+    """Same lines with lazy %-formatting and content at DEBUG"""
+    logger.info("User %s - Quick interaction started", username)
+    logger.info("Starting audio transcription")
+    logger.debug("Transcription successful: %.50s...", TRANSCRIPT)
+    logger.debug("✅ Transcription: %s", TRANSCRIPT)
+    logger.info("Getting streaming chat completion")
+    logger.info("Streaming chat completion successful (%s)", "gpt-4o-mini")
+    logger.debug("✅ GPT response: %.50s...", RESPONSE)
+    logger.info("Converting text to speech")
+    logger.info("TTS conversion successful, audio size: %s bytes", 48213)
+    logger.info("✅ Mensajes guardados")
+    logger.info("✅ Quick interaction complete")
+
+
+def run_sync(turns: int) -> float:
+    """Microseconds per turn with a synchronous StreamHandler"""
+    logger = logging.getLogger("bench.sync")
+    logger.propagate = False
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+
+    start = time.perf_counter()
+    for _ in range(turns):
+        turn_fstrings(logger, "benchmark")
+    return (time.perf_counter() - start) / turns * 1_000_000
+
+
+def run_queued(turns: int, sample_rate: float) -> tuple:
+    """Microseconds per turn in the request path, and listener drain time"""
+    from app.logging_config import (
+        JsonFormatter,
+        NonBlockingQueueHandler,
+        RequestContextFilter,
+        log_sampled_var,
+        request_id_var
+    )
+
+    logger = logging.getLogger(f"bench.queued.{sample_rate}")
+    logger.propagate = False
+    output = logging.StreamHandler(open(os.devnull, "w"))
+    output.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=turns * 12))
+    handler.addFilter(RequestContextFilter(["bench.queued"]))
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    listener = QueueListener(handler.queue, output)
+    listener.start()
+
+    start = time.perf_counter()
+    for i in range(turns):
+        request_id_var.set(f"{i:032x}")
+        log_sampled_var.set((i % 1000) < sample_rate * 1000)
+        turn_lazy(logger, "benchmark")
+    elapsed = time.perf_counter() - start
+
+    drain_start = time.perf_counter()
+    listener.stop()
+    drain = time.perf_counter() - drain_start
+    return elapsed / turns * 1_000_000, drain * 1000, handler.dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=20000)
+    args = parser.parse_args()
+
+    sync_us = run_sync(args.turns)
+    print(f"{'sync StreamHandler, f-strings':40s} {sync_us:8.1f} µs/turn")
+    for rate in (1.0, 0.1):
+        per_turn, drain_ms, dropped = run_queued(args.turns, rate)
+        print(f"{f'queued JSON, lazy, sample {rate:.0%}':40s} {per_turn:8.1f} µs/turn "
+              f"(listener drain {drain_ms:.0f} ms, dropped {dropped})")
+
+
+if __name__ == "__main__":
+    main()
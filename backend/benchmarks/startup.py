@@ -0,0 +1,93 @@
+"""
+Import-time and startup-time benchmark
+
+Measures, in fresh interpreters, how long `import app.main` takes and how
+long the application takes from lifespan start until warm-up finishes, and lists the slowest
+modules reported by `python -X importtime`.
+
+Usage (from backend/):
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import app.main
+print(f"{(time.perf_counter() - start) * 1000:.2f}")
+"""
+
+STARTUP_SNIPPET = """
+import asyncio
+import time
+start = time.perf_counter()
+from app.main import app, lifespan
+from app.services.health_service import health_service
+imported = time.perf_counter()
+
+async def run():
+    async with lifespan(app):
+        while not health_service.warmed_up:
+            await asyncio.sleep(0.005)
+        return time.perf_counter()
+
+ready = asyncio.run(run())
+print(f"{(imported - start) * 1000:.2f} {(ready - imported) * 1000:.2f}")
+"""
+
+
+def run_snippet(snippet: str) -> str:
+    """Run a snippet in a fresh interpreter and return its last stdout line"""
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def slowest_imports(limit: int):
+    """Parse `-X importtime` output and return the slowest cumulative imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, module = line.replace(":", "|", 1).split("|")
+        rows.append((int(cumulative_us), module.strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--lifespan", action="store_true", help="Also time lifespan startup until warm-up (needs DB)")
+    args = parser.parse_args()
+
+    import_times = [float(run_snippet(IMPORT_SNIPPET)) for _ in range(args.runs)]
+    print(f"import app.main: median {statistics.median(import_times):.1f} ms "
+          f"(min {min(import_times):.1f} / max {max(import_times):.1f}, {args.runs} runs)")
+
+    if args.lifespan:
+        startup_times = [float(run_snippet(STARTUP_SNIPPET).split()[1]) for _ in range(args.runs)]
+        print(f"startup to ready: median {statistics.median(startup_times):.1f} ms "
+              f"(min {min(startup_times):.1f} / max {max(startup_times):.1f})")
+
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, module in slowest_imports(args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
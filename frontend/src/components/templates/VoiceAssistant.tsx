@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef, useCallback } from 'react'
 import { useAudioRecorder } from '@/hooks/useAudioRecorder'
 import { voiceAPI } from '@/services/api'
 import { playAudioBlob } from '@/utils/audioPlayer'
@@ -8,6 +8,15 @@ import { MessagePanel } from '@/components/organisms/MessagePanel'
 import type { Conversation, ChatMessage } from '@/types'
 import { useAuth } from '@/contexts/AuthContext'
 
+// Subida por segmentos (VAD): transcribir mientras el usuario habla
+const SEGMENTED_UPLOAD = import.meta.env.VITE_SEGMENTED_UPLOAD !== 'false'
+
+interface PendingUtterance {
+  id: Promise<string>
+  uploads: Promise<void>[]
+  lastIndex: number
+}
+
 export const VoiceAssistant: React.FC = () => {
   const [conversations, setConversations] = useState<Conversation[]>([])
   const [activeConversationId, setActiveConversationId] = useState<number | null>(null)
@@ -19,6 +28,18 @@ export const VoiceAssistant: React.FC = () => {
   const [error, setError] = useState<string | null>(null)
   const [showMessagePanel, setShowMessagePanel] = useState(false)
   const { user } = useAuth()
+  const utteranceRef = useRef<PendingUtterance | null>(null)
+
+  // Los segmentos intermedios se suben en cuanto los corta el VAD
+  const handleSegment = useCallback((segment: Blob, index: number, final: boolean) => {
+    const utterance = utteranceRef.current
+    if (!utterance) return
+    if (final) {
+      utterance.lastIndex = index
+      return
+    }
+    utterance.uploads.push(utterance.id.then((id) => voiceAPI.uploadSegment(id, index, segment)))
+  }, [])
 
   const {
     isRecording,
@@ -28,7 +49,17 @@ export const VoiceAssistant: React.FC = () => {
     stopRecording,
     clearAudio,
     getAudioFile,
-  } = useAudioRecorder()
+    getRecordingFile,
+  } = useAudioRecorder(SEGMENTED_UPLOAD ? { onSegment: handleSegment } : {})
+
+  const startTurn = async (): Promise<void> => {
+    if (SEGMENTED_UPLOAD) {
+      const id = voiceAPI.createUtterance()
+      id.catch(() => undefined)
+      utteranceRef.current = { id, uploads: [], lastIndex: 0 }
+    }
+    await startRecording()
+  }
 
   // Cargar conversaciones al iniciar
   useEffect(() => {
@@ -121,28 +152,51 @@ export const VoiceAssistant: React.FC = () => {
         return
         }
 
-        console.log('⚡ Usando quick interaction...')
-        
-        // Usar el método rápido (todo en paralelo)
-        const result = await voiceAPI.quickVoiceInteraction(audioFile)
-        
-        console.log('✅ Transcripción:', result.transcription)
-        console.log('✅ Respuesta:', result.response)
+        // Usar el método rápido con frames: el texto llega antes que el audio
+        const onText = (text: { transcription: string; response: string }) => {
+        console.log('✅ Transcripción:', text.transcription)
+        console.log('✅ Respuesta:', text.response)
 
         const userMessage: ChatMessage = {
-        role: 'user',
-        content: result.transcription,
-        timestamp: new Date().toISOString(),
+            role: 'user',
+            content: text.transcription,
+            timestamp: new Date().toISOString(),
         }
 
         const assistantMessage: ChatMessage = {
-        role: 'assistant',
-        content: result.response,
-        timestamp: new Date().toISOString(),
+            role: 'assistant',
+            content: text.response,
+            timestamp: new Date().toISOString(),
+        }
+
+        setConversationHistory((prev) => [...prev, userMessage, assistantMessage])
         }
 
-        const newHistory = [...conversationHistory, userMessage, assistantMessage]
-        setConversationHistory(newHistory)
+        const utterance = utteranceRef.current
+        utteranceRef.current = null
+        let result: Awaited<ReturnType<typeof voiceAPI.quickVoiceInteractionFrames>>
+        let utteranceId: string | null = null
+        if (utterance) {
+          try {
+            utteranceId = await utterance.id
+            await Promise.all(utterance.uploads)
+          } catch (err) {
+            // Un segmento intermedio falló: enviar la grabación completa
+            console.warn('⚠️ Falló la subida por segmentos, usando quick interaction:', err)
+            utterance.id.then((id) => voiceAPI.discardUtterance(id)).catch(() => undefined)
+            utteranceId = null
+          }
+        }
+        if (utterance && utteranceId) {
+          console.log('⚡ Cerrando enunciado por segmentos...')
+          result = await voiceAPI.finishUtteranceFrames(utteranceId, utterance.lastIndex, audioFile, onText)
+        } else if (utterance) {
+          const recordingFile = (await getRecordingFile()) ?? audioFile
+          result = await voiceAPI.quickVoiceInteractionFrames(recordingFile, onText)
+        } else {
+          console.log('⚡ Usando quick interaction...')
+          result = await voiceAPI.quickVoiceInteractionFrames(audioFile, onText)
+        }
 
         setIsPlaying(true)
         setIsProcessing(false)
@@ -159,7 +213,7 @@ export const VoiceAssistant: React.FC = () => {
         if (isInCall) {
         console.log('🎤 Iniciando nueva grabación...')
         setTimeout(() => {
-            startRecording()
+            startTurn()
         }, 500)
         }
     } catch (err: any) {
@@ -175,6 +229,9 @@ export const VoiceAssistant: React.FC = () => {
       if (isRecording) {
         stopRecording()
       }
+      const utterance = utteranceRef.current
+      utteranceRef.current = null
+      utterance?.id.then((id) => voiceAPI.discardUtterance(id)).catch(() => undefined)
       setIsInCall(false)
       // NO limpiar el historial - mantenerlo visible
     } else {
@@ -183,7 +240,7 @@ export const VoiceAssistant: React.FC = () => {
       setError(null)
       
       setTimeout(async () => {
-        await startRecording()
+        await startTurn()
       }, 100)
     }
   }
@@ -34,6 +34,9 @@ export const AuthProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
       const response: AuthResponse = await authAPI.login(credentials)
       
       localStorage.setItem('access_token', response.access_token)
+      if (response.refresh_token) {
+        localStorage.setItem('refresh_token', response.refresh_token)
+      }
       localStorage.setItem('user', JSON.stringify(response.user))
       
       setUser(response.user)
@@ -47,6 +50,9 @@ export const AuthProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
       const response: AuthResponse = await authAPI.register(data)
       
       localStorage.setItem('access_token', response.access_token)
+      if (response.refresh_token) {
+        localStorage.setItem('refresh_token', response.refresh_token)
+      }
       localStorage.setItem('user', JSON.stringify(response.user))
       
       setUser(response.user)
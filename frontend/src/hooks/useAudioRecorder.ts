@@ -1,7 +1,13 @@
 import { useState, useRef, useCallback } from 'react'
-import type { AudioRecorderHook } from '@/types'
+import type { AudioRecorderHook, AudioRecorderOptions } from '@/types'
 
-export const useAudioRecorder = (): AudioRecorderHook => {
+// VAD para la subida por segmentos: una pausa tras voz cierra el segmento
+const VAD_RMS_THRESHOLD = 0.015
+const VAD_POLL_MS = 50
+const SEGMENT_PAUSE_MS = 350
+const SEGMENT_MIN_MS = 800
+
+export const useAudioRecorder = (options: AudioRecorderOptions = {}): AudioRecorderHook => {
   const [isRecording, setIsRecording] = useState<boolean>(false)
   const [audioBlob, setAudioBlob] = useState<Blob | null>(null)
   const [error, setError] = useState<string | null>(null)
@@ -9,6 +15,15 @@ export const useAudioRecorder = (): AudioRecorderHook => {
   const mediaRecorderRef = useRef<MediaRecorder | null>(null)
   const audioChunksRef = useRef<Blob[]>([])
   const silenceTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null)
+  const onSegmentRef = useRef(options.onSegment)
+  onSegmentRef.current = options.onSegment
+  const vadTimerRef = useRef<ReturnType<typeof setInterval> | null>(null)
+  const audioContextRef = useRef<AudioContext | null>(null)
+  const segmentIndexRef = useRef(0)
+  const stoppingRef = useRef(false)
+  // Con segmentos, un MediaRecorder paralelo graba el enunciado completo
+  const fullRecorderRef = useRef<MediaRecorder | null>(null)
+  const recordingRef = useRef<Promise<Blob> | null>(null)
 
   const startRecording = useCallback(async (): Promise<void> => {
     console.log('🎤 [Hook] startRecording llamado')
@@ -37,40 +52,113 @@ export const useAudioRecorder = (): AudioRecorderHook => {
       
       console.log('🎤 [Hook] MIME type seleccionado:', mimeType)
 
-      const mediaRecorder = new MediaRecorder(stream, { mimeType })
-      console.log('✅ [Hook] MediaRecorder creado:', mediaRecorder)
+      segmentIndexRef.current = 0
+      stoppingRef.current = false
+      fullRecorderRef.current = null
+      recordingRef.current = null
+
+      // Un MediaRecorder por segmento: cada segmento es un fichero de audio completo
+      const startSegmentRecorder = (): void => {
+        const mediaRecorder = new MediaRecorder(stream, { mimeType })
+        console.log('✅ [Hook] MediaRecorder creado:', mediaRecorder)
+        const index = segmentIndexRef.current++
+        const chunks: Blob[] = []
+
+        mediaRecorderRef.current = mediaRecorder
+        audioChunksRef.current = chunks
+
+        mediaRecorder.ondataavailable = (event: BlobEvent) => {
+          console.log('📦 [Hook] Datos disponibles:', event.data.size, 'bytes')
+          if (event.data.size > 0) {
+            chunks.push(event.data)
+          }
+        }
 
-      mediaRecorderRef.current = mediaRecorder
-      audioChunksRef.current = []
+        mediaRecorder.onstop = () => {
+          // Final: el que detuvo stopRecording (un corte por VAD ya arrancó el siguiente)
+          const final = stoppingRef.current && mediaRecorderRef.current === mediaRecorder
+          console.log('⏹️ [Hook] Segmento detenido:', index, final ? '(final)' : '')
+          console.log('📦 [Hook] Chunks totales:', chunks.length)
+
+          const audioBlob = new Blob(chunks, { type: mimeType })
+          console.log('🎵 [Hook] Audio blob creado:', audioBlob.size, 'bytes')
+
+          onSegmentRef.current?.(audioBlob, index, final)
+          if (!final) return
+
+          setAudioBlob(audioBlob)
+          if (vadTimerRef.current) {
+            clearInterval(vadTimerRef.current)
+            vadTimerRef.current = null
+          }
+          audioContextRef.current?.close()
+          audioContextRef.current = null
+          stream.getTracks().forEach((track) => {
+            console.log('🛑 [Hook] Deteniendo track:', track)
+            track.stop()
+          })
+        }
 
-      mediaRecorder.ondataavailable = (event: BlobEvent) => {
-        console.log('📦 [Hook] Datos disponibles:', event.data.size, 'bytes')
-        if (event.data.size > 0) {
-          audioChunksRef.current.push(event.data)
+        mediaRecorder.onerror = (event: any) => {
+          console.error('❌ [Hook] Error en MediaRecorder:', event)
         }
-      }
 
-      mediaRecorder.onstop = () => {
-        console.log('⏹️ [Hook] Grabación detenida')
-        console.log('📦 [Hook] Chunks totales:', audioChunksRef.current.length)
-        
-        const audioBlob = new Blob(audioChunksRef.current, { type: mimeType })
-        console.log('🎵 [Hook] Audio blob creado:', audioBlob.size, 'bytes')
-        
-        setAudioBlob(audioBlob)
-        stream.getTracks().forEach((track) => {
-          console.log('🛑 [Hook] Deteniendo track:', track)
-          track.stop()
-        })
+        console.log('▶️ [Hook] Iniciando grabación...')
+        mediaRecorder.start()
+        console.log('🔴 [Hook] State después de start():', mediaRecorder.state)
       }
 
-      mediaRecorder.onerror = (event: any) => {
-        console.error('❌ [Hook] Error en MediaRecorder:', event)
-      }
+      startSegmentRecorder()
 
-      console.log('▶️ [Hook] Iniciando grabación...')
-      mediaRecorder.start()
-      console.log('🔴 [Hook] State después de start():', mediaRecorder.state)
+      if (onSegmentRef.current) {
+        // Los segmentos son ficheros sueltos que no se pueden concatenar
+        const fullRecorder = new MediaRecorder(stream, { mimeType })
+        const fullChunks: Blob[] = []
+        fullRecorder.ondataavailable = (event: BlobEvent) => {
+          if (event.data.size > 0) {
+            fullChunks.push(event.data)
+          }
+        }
+        recordingRef.current = new Promise<Blob>((resolve) => {
+          fullRecorder.onstop = () => resolve(new Blob(fullChunks, { type: mimeType }))
+        })
+        fullRecorderRef.current = fullRecorder
+        fullRecorder.start()
+
+        // VAD por energía: cortar el segmento en cada pausa tras haber voz
+        const audioContext = new AudioContext()
+        const analyser = audioContext.createAnalyser()
+        analyser.fftSize = 1024
+        audioContext.createMediaStreamSource(stream).connect(analyser)
+        audioContextRef.current = audioContext
+
+        const samples = new Float32Array(analyser.fftSize)
+        let segmentStartedAt = Date.now()
+        let lastVoiceAt = 0
+
+        vadTimerRef.current = setInterval(() => {
+          analyser.getFloatTimeDomainData(samples)
+          let energy = 0
+          for (const sample of samples) energy += sample * sample
+          const now = Date.now()
+          if (Math.sqrt(energy / samples.length) > VAD_RMS_THRESHOLD) {
+            lastVoiceAt = now
+            return
+          }
+          if (
+            lastVoiceAt > segmentStartedAt &&
+            now - lastVoiceAt >= SEGMENT_PAUSE_MS &&
+            now - segmentStartedAt >= SEGMENT_MIN_MS &&
+            mediaRecorderRef.current?.state === 'recording'
+          ) {
+            console.log('✂️ [Hook] Pausa detectada, cerrando segmento', segmentIndexRef.current - 1)
+            const finished = mediaRecorderRef.current
+            startSegmentRecorder()
+            finished.stop()
+            segmentStartedAt = now
+          }
+        }, VAD_POLL_MS)
+      }
       
       setIsRecording(true)
       console.log('✅ [Hook] isRecording = true')
@@ -101,11 +189,16 @@ export const useAudioRecorder = (): AudioRecorderHook => {
       console.log('⏹️ [Hook] Timer limpiado')
     }
 
+    if (fullRecorderRef.current?.state === 'recording') {
+      fullRecorderRef.current.stop()
+    }
+
     if (mediaRecorderRef.current) {
       console.log('⏹️ [Hook] MediaRecorder state:', mediaRecorderRef.current.state)
       
       if (mediaRecorderRef.current.state === 'recording') {
         console.log('⏹️ [Hook] Deteniendo MediaRecorder...')
+        stoppingRef.current = true
         mediaRecorderRef.current.stop()
       }
     }
@@ -118,6 +211,7 @@ export const useAudioRecorder = (): AudioRecorderHook => {
     console.log('🗑️ [Hook] Limpiando audio')
     setAudioBlob(null)
     audioChunksRef.current = []
+    recordingRef.current = null
   }, [])
 
   const getAudioFile = useCallback((): File | null => {
@@ -132,6 +226,12 @@ export const useAudioRecorder = (): AudioRecorderHook => {
     return file
   }, [audioBlob])
 
+  const getRecordingFile = useCallback(async (): Promise<File | null> => {
+    const recording = await recordingRef.current
+    if (!recording) return null
+    return new File([recording], 'recording.webm', { type: 'audio/webm' })
+  }, [])
+
   return {
     isRecording,
     audioBlob,
@@ -140,5 +240,6 @@ export const useAudioRecorder = (): AudioRecorderHook => {
     stopRecording,
     clearAudio,
     getAudioFile,
+    getRecordingFile,
   }
 }
\ No newline at end of file
@@ -34,20 +34,163 @@ apiClient.interceptors.request.use(
   }
 )
 
+function clearSession() {
+  localStorage.removeItem('access_token')
+  localStorage.removeItem('refresh_token')
+  localStorage.removeItem('user')
+}
+
+// Renovación del access token (una sola petición aunque fallen varias a la vez)
+let refreshPromise: Promise<string | null> | null = null
+
+function refreshAccessToken(): Promise<string | null> {
+  const refreshToken = localStorage.getItem('refresh_token')
+  if (!refreshToken) return Promise.resolve(null)
+  if (!refreshPromise) {
+    refreshPromise = axios
+      .post<AuthResponse>(`${API_BASE_URL}/api/auth/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('access_token', response.data.access_token)
+        if (response.data.refresh_token) {
+          localStorage.setItem('refresh_token', response.data.refresh_token)
+        }
+        return response.data.access_token
+      })
+      .catch(() => null)
+      .finally(() => {
+        refreshPromise = null
+      })
+  }
+  return refreshPromise
+}
+
 // Interceptor para manejar errores de autenticación
 apiClient.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response?.status === 401) {
-      // Token expirado o inválido
-      localStorage.removeItem('access_token')
-      localStorage.removeItem('user')
+  async (error) => {
+    const original = error.config
+    if (error.response?.status === 401 && original && !original._retried) {
+      // Access token expirado: renovar y repetir una vez
+      original._retried = true
+      const token = await refreshAccessToken()
+      if (token) {
+        original.headers.Authorization = `Bearer ${token}`
+        return apiClient(original)
+      }
+      clearSession()
       window.location.href = '/login'
     }
     return Promise.reject(error)
   }
 )
 
+// Tipos de frame de application/x-voice-frames (ver backend app/services/voice_frames.py)
+const VOICE_FRAME = {
+  TRANSCRIPT: 0x01,
+  RESPONSE_TEXT: 0x02,
+  AUDIO: 0x03,
+  END: 0x04,
+  ERROR: 0x05,
+} as const
+
+interface VoiceTurnText {
+  transcription: string
+  response: string
+}
+
+interface VoiceTurnResult extends VoiceTurnText {
+  audio: Blob
+}
+
+function segmentFilename(segment: Blob, index: number): string {
+  // La extensión indica a Whisper el formato del segmento
+  return `segment-${index}.${segment.type.includes('mp4') ? 'm4a' : 'webm'}`
+}
+
+// POST multipart con fetch (para leer la respuesta en streaming), renovando el token en 401
+async function postForStream(path: string, formData: FormData): Promise<Response> {
+  const send = (token: string | null) =>
+    fetch(`${API_BASE_URL}${path}`, {
+      method: 'POST',
+      headers: token ? { Authorization: `Bearer ${token}` } : {},
+      body: formData,
+    })
+
+  let res = await send(localStorage.getItem('access_token'))
+  if (res.status === 401) {
+    const token = await refreshAccessToken()
+    if (token) {
+      res = await send(token)
+    }
+  }
+  if (res.status === 401) {
+    clearSession()
+    window.location.href = '/login'
+  }
+  if (!res.ok || !res.body) {
+    throw new Error(`Quick interaction failed: ${res.status}`)
+  }
+  return res
+}
+
+/**
+ * Leer un flujo application/x-voice-frames.
+ * Cada frame: 1 byte de tipo + 4 bytes de longitud (big-endian) + payload.
+ */
+async function readVoiceFrames(
+  res: Response,
+  onText?: (text: VoiceTurnText) => void
+): Promise<VoiceTurnResult> {
+  const decoder = new TextDecoder()
+  const reader = res.body!.getReader()
+  const audioChunks: Uint8Array[] = []
+  let buffer = new Uint8Array(0)
+  let transcription = ''
+  let responseText = ''
+  let finished = false
+
+  while (!finished) {
+    const { done, value } = await reader.read()
+    if (value) {
+      const merged = new Uint8Array(buffer.length + value.length)
+      merged.set(buffer)
+      merged.set(value, buffer.length)
+      buffer = merged
+    }
+
+    while (buffer.length >= 5) {
+      const view = new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength)
+      const type = view.getUint8(0)
+      const length = view.getUint32(1)
+      if (buffer.length < 5 + length) break
+
+      const payload = buffer.slice(5, 5 + length)
+      buffer = buffer.slice(5 + length)
+
+      if (type === VOICE_FRAME.TRANSCRIPT) {
+        transcription = decoder.decode(payload)
+      } else if (type === VOICE_FRAME.RESPONSE_TEXT) {
+        responseText = decoder.decode(payload)
+        onText?.({ transcription, response: responseText })
+      } else if (type === VOICE_FRAME.AUDIO) {
+        audioChunks.push(payload)
+      } else if (type === VOICE_FRAME.ERROR) {
+        throw new Error(JSON.parse(decoder.decode(payload)).detail)
+      } else if (type === VOICE_FRAME.END) {
+        finished = true
+      }
+    }
+
+    if (done) break
+  }
+
+  return {
+    audio: new Blob(audioChunks, { type: 'audio/mpeg' }),
+    transcription,
+    response: responseText,
+  }
+}
+
 export const authAPI = {
   async register(data: RegisterData): Promise<AuthResponse> {
     const response = await apiClient.post<AuthResponse>('/api/auth/register', data)
@@ -65,8 +208,9 @@ export const authAPI = {
   },
 
   logout() {
-    localStorage.removeItem('access_token')
-    localStorage.removeItem('user')
+    const refreshToken = localStorage.getItem('refresh_token')
+    apiClient.post('/api/auth/logout', refreshToken ? { refresh_token: refreshToken } : undefined).catch(() => {})
+    clearSession()
   },
 }
 
@@ -140,6 +284,64 @@ export const voiceAPI = {
     }
   },
 
+  /**
+   * Interacción rápida con framing binario (application/x-voice-frames).
+   * La transcripción y la respuesta llegan antes que el audio, por lo que
+   * onText se invoca en cuanto están disponibles.
+   */
+  async quickVoiceInteractionFrames(
+    audioFile: File,
+    onText?: (text: VoiceTurnText) => void
+  ): Promise<VoiceTurnResult> {
+    const formData = new FormData()
+    formData.append('audio', audioFile)
+
+    const res = await postForStream('/api/voice/quick-interaction?framing=frames', formData)
+    return readVoiceFrames(res, onText)
+  },
+
+  /**
+   * Subida por segmentos: se abre un enunciado al empezar a grabar, cada
+   * segmento cortado por VAD se sube (y transcribe) mientras el usuario
+   * sigue hablando, y el último devuelve la respuesta en frames.
+   */
+  async createUtterance(): Promise<string> {
+    const response = await apiClient.post<{ utterance_id: string }>('/api/voice/utterances')
+    return response.data.utterance_id
+  },
+
+  async uploadSegment(utteranceId: string, index: number, segment: Blob): Promise<void> {
+    const formData = new FormData()
+    formData.append('audio', segment, segmentFilename(segment, index))
+
+    await apiClient.post(`/api/voice/segments/${utteranceId}`, formData, {
+      params: { index },
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    })
+  },
+
+  async finishUtteranceFrames(
+    utteranceId: string,
+    index: number,
+    segment: Blob,
+    onText?: (text: VoiceTurnText) => void
+  ): Promise<VoiceTurnResult> {
+    const formData = new FormData()
+    formData.append('audio', segment, segmentFilename(segment, index))
+
+    const res = await postForStream(
+      `/api/voice/segments/${utteranceId}/final?index=${index}&framing=frames`,
+      formData
+    )
+    return readVoiceFrames(res, onText)
+  },
+
+  async discardUtterance(utteranceId: string): Promise<void> {
+    await apiClient.delete(`/api/voice/utterances/${utteranceId}`)
+  },
+
   async createConversation(userId: number, title: string): Promise<any> {
     const response = await apiClient.post('/api/voice/create-conversation', null, {
       params: { user_id: userId, title }
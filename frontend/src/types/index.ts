@@ -11,6 +11,12 @@ export interface VoiceRecorderState {
   error: string | null
 }
 
+export interface AudioRecorderOptions {
+  // Subida por segmentos: se invoca con cada segmento cortado por VAD
+  // (final = true para el último, al detener la grabación)
+  onSegment?: (segment: Blob, index: number, final: boolean) => void
+}
+
 export interface AudioRecorderHook {
   isRecording: boolean
   audioBlob: Blob | null
@@ -19,6 +25,8 @@ export interface AudioRecorderHook {
   stopRecording: () => void
   clearAudio: () => void
   getAudioFile: () => File | null
+  // Grabación completa del enunciado (solo con onSegment), p. ej. para reenviarla entera
+  getRecordingFile: () => Promise<File | null>
 }
 
 export interface Conversation {
@@ -55,7 +63,9 @@ export interface RegisterData {
 
 export interface AuthResponse {
   access_token: string
+  refresh_token?: string
   token_type: string
+  expires_in?: number
   user: User
 }
 